@@ -0,0 +1,55 @@
+"""
+Production server configuration, loaded automatically by ``gunicorn``.
+
+Each worker process runs several threads (gthread): requests mostly wait on
+SQLite, storage or the client, and image processing runs on the job runner's
+own threads. Worker count follows the CPUs this container may use.
+
+- WEB_CONCURRENCY - worker processes (default: usable CPUs, at least 2)
+- GUNICORN_THREADS - threads per worker (default 4)
+- GUNICORN_TIMEOUT - seconds a request may run before its worker is replaced (default 120, for large uploads)
+- GUNICORN_PRELOAD - ``0`` to import the app in each worker instead of once before forking
+
+Reloading: ``kill -HUP <master>`` starts fresh workers and lets the old ones
+finish their requests (graceful_timeout). With preload on, workers fork from
+the already-imported app, so deploying new code needs a new master:
+``kill -USR2 <master>`` starts one next to the old, then ``kill -QUIT`` the
+old master once the new one is ready.
+"""
+
+import os
+
+
+def usable_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+wsgi_app = 'src.main:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, usable_cpus())))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Importing the app once before forking shares its memory between workers and
+# surfaces import errors before any worker starts; it opens no connections
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Replace workers now and then so slow leaks cannot build up; jitter keeps them
+# from all restarting at once
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+# Trust X-Forwarded-* from a proxy on this host only; set FORWARDED_ALLOW_IPS to
+# the platform router's addresses (comma-separated, or '*' when nothing else
+# can reach the workers) to trust it too
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1,::1')
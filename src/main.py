@@ -3,76 +3,120 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
+from werkzeug.exceptions import NotFound
 from src.models.user import db
+from src.models import versioning
+from src.models.engine import configure_engine, database_uri, tune_engine
+from src.services.batch import BatchAwareRequest
+from src.services.cache import response_cache
+from src.services.derivatives import derivative_cache
+from src.services.jobs import job_runner
+from src.services.processing import (backfill_content_hashes_command, backfill_exif_command, hash_images_command,
+                                     reprocess_images_command)
+from src.services.query_plans import check_query_plans_command
+from src.services.similarity import similarity_index
+from src.services.startup import bootstrap
+from src.services.static_assets import static_assets
+from src.services.storage import storage
+from src.services.templates import templates
 from src.routes.user import user_bp
 from src.routes.admin import admin_bp
 from src.routes.api import api_bp
+from src.routes.images import images_bp
+from src.routes.health import health_bp
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'minds-eye-photography-secret-key-2025'
+def create_app():
+    """Build the application without touching the database.
 
-# Enable CORS for all routes
-CORS(app)
-
-# Register blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(admin_bp)
-app.register_blueprint(api_bp, url_prefix='/api')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-db.init_app(app)
-
-# Create database tables and initial data
-with app.app_context():
-    db.create_all()
+    Pending migrations and interrupted jobs are handled by ``bootstrap`` on
+    the first request each process serves, or ahead of time with
+    ``flask bootstrap``.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.request_class = BatchAwareRequest
+    app.config['SECRET_KEY'] = 'minds-eye-photography-secret-key-2025'
     
-    # Create default categories if they don't exist
-    from src.models.user import Category
-    default_categories = [
-        {'name': 'Nature', 'description': 'Natural landscapes and wildlife photography'},
-        {'name': 'Portrait', 'description': 'Portrait and people photography'},
-        {'name': 'Architecture', 'description': 'Buildings and architectural photography'},
-        {'name': 'Street', 'description': 'Street photography and urban scenes'},
-        {'name': 'Miscellaneous', 'description': 'Other photography work'}
-    ]
+    # Enable CORS for all routes
+    CORS(app)
     
-    for i, cat_data in enumerate(default_categories):
-        existing = Category.query.filter_by(name=cat_data['name']).first()
-        if not existing:
-            category = Category(
-                name=cat_data['name'],
-                description=cat_data['description'],
-                sort_order=i
-            )
-            db.session.add(category)
+    # Register blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    app.register_blueprint(images_bp)
+    app.register_blueprint(health_bp)
     
-    try:
-        db.session.commit()
-    except:
-        db.session.rollback()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    # Database configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
+    # Only the batch upload endpoint accepts bodies this large
+    app.config['BATCH_MAX_CONTENT_LENGTH'] = int(os.environ.get('BATCH_MAX_UPLOAD_MB', 1024)) * 1024 * 1024
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(app.static_folder, 'assets'))
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+    app.config['API_CACHE_MAX_AGE'] = int(os.environ.get('API_CACHE_MAX_AGE', 60))
+    app.config['CACHE_URL'] = os.environ.get('CACHE_URL', 'memory://')
+    app.config['STATIC_ACCEL_REDIRECT'] = os.environ.get('STATIC_ACCEL_REDIRECT')
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.config['STORAGE_URL'] = os.environ.get('STORAGE_URL')
+    app.config['STORAGE_PUBLIC_URL'] = os.environ.get('STORAGE_PUBLIC_URL')
+    app.config['DERIVATIVE_CACHE_MAX_BYTES'] = int(os.environ.get('DERIVATIVE_CACHE_MB', 1024)) * 1024 * 1024
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', '1') == '1'
+    app.config['TEMPLATE_BYTECODE_CACHE'] = os.environ.get('TEMPLATE_BYTECODE_CACHE')
+    app.config['SIMILAR_MAX_DISTANCE'] = int(os.environ.get('SIMILAR_MAX_DISTANCE', 10))
+    
+    configure_engine(app)
+    db.init_app(app)
+    job_runner.init_app(app)
+    response_cache.init_app(app)
+    static_assets.init_app(app)
+    storage.init_app(app)
+    derivative_cache.init_app(app)
+    templates.init_app(app)
+    similarity_index.init_app(app)
+    bootstrap.init_app(app)
+    app.cli.add_command(reprocess_images_command)
+    app.cli.add_command(backfill_exif_command)
+    app.cli.add_command(hash_images_command)
+    app.cli.add_command(backfill_content_hashes_command)
+    app.cli.add_command(check_query_plans_command)
+    
+    with app.app_context():
+        # Creating the engine does not connect, so this costs nothing at startup
+        tune_engine(db.engine, app.config)
+    
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if app.static_folder is None:
+            return "Static folder not configured", 404
+    
+        # Uploaded images live in the configured storage backend
+        if path.startswith('assets/'):
+            return storage.send(path[len('assets/'):])
+    
+        if path != "":
+            try:
+                return static_assets.send(path)
+            except NotFound:
+                pass
+    
+        try:
+            return static_assets.send('index.html')
+        except NotFound:
             return "index.html not found", 404
+    
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=os.environ.get('FLASK_DEBUG') == '1')
 
@@ -0,0 +1,88 @@
+"""
+Database engine configuration.
+
+DATABASE_URL selects the database (``postgres://`` URLs as issued by
+Railway/Heroku are accepted); without it the bundled SQLite file is used.
+
+SQLite connections are tuned on connect for a multi-threaded web server:
+
+- ``journal_mode=WAL`` lets readers proceed while a writer commits
+- ``synchronous=NORMAL`` is durable across application crashes under WAL and
+  avoids an fsync per commit
+- ``busy_timeout`` makes a blocked writer wait instead of failing with
+  "database is locked"
+- ``cache_size`` and ``mmap_size`` keep hot pages in memory
+
+Every setting can be overridden through app config before ``db.init_app``.
+"""
+
+import os
+from sqlalchemy import event
+
+
+def database_uri(default):
+    """DATABASE_URL from the environment, normalised for SQLAlchemy, or `default`"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return default
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def configure_engine(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS for the configured database URI"""
+    app.config.setdefault('DB_POOL_SIZE', 10)
+    app.config.setdefault('DB_MAX_OVERFLOW', 10)
+    app.config.setdefault('DB_POOL_TIMEOUT', 30)
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    app.config.setdefault('SQLITE_CACHE_SIZE_KB', 64 * 1024)
+    app.config.setdefault('SQLITE_MMAP_SIZE_MB', 256)
+
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = {}
+    # In-memory SQLite uses a single shared connection rather than a pool
+    if uri not in ('sqlite://', 'sqlite:///') and ':memory:' not in uri:
+        options['pool_size'] = config['DB_POOL_SIZE']
+        options['max_overflow'] = config['DB_MAX_OVERFLOW']
+        options['pool_timeout'] = config['DB_POOL_TIMEOUT']
+    if uri.startswith('sqlite'):
+        options['connect_args'] = {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            # Pooled connections are handed to whichever thread checks them out
+            'check_same_thread': False,
+        }
+    else:
+        # Server databases drop idle connections; test and recycle them
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE_MB']) * 1024 * 1024}",
+    ]
+
+
+def tune_engine(engine, config):
+    """Apply the SQLite pragmas to every new connection of an engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,71 @@
+"""
+Eager-loading strategies for serialization.
+
+Each endpoint asks for the loader options matching the fields it is about to
+serialize, so relationships are fetched with one extra SELECT per
+relationship (selectinload) or inside the main query (joinedload) instead of
+one SELECT per row.
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from src.models.user import db, PortfolioImage, FeaturedImage
+
+# Relationship -> serialized fields that read it
+RELATIONSHIP_FIELDS = {
+    PortfolioImage.categories: ('categories', 'category_names'),
+    PortfolioImage.renditions: ('renditions', 'display_url', 'thumbnail_url', 'srcset'),
+}
+
+
+def image_loader_options(fields=None):
+    """selectinload options for the relationships to_dict(fields) will touch"""
+    fields = set(PortfolioImage.SERIALIZERS if fields is None else fields)
+    return [
+        selectinload(relationship)
+        for relationship, readers in RELATIONSHIP_FIELDS.items()
+        if fields.intersection(readers)
+    ]
+
+
+def featured_loader_options():
+    """Load a featured entry's image in the same query, then its relationships"""
+    image = joinedload(FeaturedImage.portfolio_image)
+    return [image.selectinload(relationship) for relationship in RELATIONSHIP_FIELDS]
+
+
+class QueryCounter:
+    """Records every SQL statement executed on an engine while active"""
+
+    def __init__(self, engine=None):
+        self.engine = engine or db.engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Fail if the block runs more than `limit` SQL statements.
+
+    Use around a request or serialization in tests to pin query counts, e.g.
+    ``with assert_max_queries(3): client.get('/api/portfolio')``.
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f'  {statement}' for statement in counter.statements)
+        raise AssertionError(f'{counter.count} queries executed, expected at most {limit}:\n{listing}')
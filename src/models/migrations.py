@@ -0,0 +1,169 @@
+"""
+Versioned, additive schema migrations.
+
+This is the only place the schema is created or changed. Each migration runs
+once, in order, and is recorded in ``schema_migration``; once every migration
+has been applied, ``upgrade()`` costs a single query at startup.
+
+Migration 0 creates every table the models declare, so a fresh database
+already has every column and index later migrations add: they must be
+idempotent. A model added later needs its own migration creating its table,
+because existing databases have already applied migration 0.
+"""
+
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+from src.models.user import db, image_categories, Category, ImageMetadata, PortfolioImage
+from src.models.versioning import CONTENT_GROUPS, VERSIONED_MODELS, bump_versions
+from src.services.search import create_search_index
+
+schema_migration = db.Table('schema_migration',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+# Arbitrary constant identifying the migration lock among PostgreSQL advisory locks
+MIGRATION_LOCK_KEY = 0x6d696e6473
+
+DEFAULT_CATEGORIES = [
+    ('Nature', 'Natural landscapes and wildlife photography'),
+    ('Portrait', 'Portrait and people photography'),
+    ('Architecture', 'Buildings and architectural photography'),
+    ('Street', 'Street photography and urban scenes'),
+    ('Miscellaneous', 'Other photography work'),
+]
+
+
+def add_column(connection, table, column, ddl):
+    """Add a column unless the table already has it"""
+    existing = {col['name'] for col in inspect(connection).get_columns(table)}
+    if column not in existing:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _initial_schema(connection):
+    db.metadata.create_all(connection)
+
+
+def _portfolio_image_status(connection):
+    add_column(connection, 'portfolio_image', 'status', "VARCHAR(20) DEFAULT 'ready'")
+
+
+def _seed_content_versions(connection):
+    bump_versions(connection, CONTENT_GROUPS)
+
+
+def _portfolio_image_content_hash(connection):
+    # Existing originals are hashed by `flask backfill-content-hashes`, in batches outside this transaction
+    add_column(connection, 'portfolio_image', 'content_hash', 'VARCHAR(64)')
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_portfolio_image_content_hash ON portfolio_image (content_hash)'
+    ))
+
+
+def _create_indexes(connection, names):
+    indexes = PortfolioImage.__table__.indexes | image_categories.indexes
+    for index in indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+
+def _gallery_indexes(connection):
+    _create_indexes(connection, ('ix_portfolio_image_gallery', 'ix_portfolio_image_recent',
+                                 'ix_portfolio_image_date_taken', 'ix_image_categories_category'))
+
+
+def _default_categories(connection):
+    existing = set(connection.execute(select(Category.name)).scalars())
+    missing = [(sort_order, name, description) for sort_order, (name, description) in enumerate(DEFAULT_CATEGORIES)
+               if name not in existing]
+    for sort_order, name, description in missing:
+        connection.execute(Category.__table__.insert().values(
+            name=name, description=description, sort_order=sort_order, created_at=datetime.utcnow()
+        ))
+    if missing:
+        bump_versions(connection, [VERSIONED_MODELS[Category]])
+
+
+def _search_index(connection):
+    # Full-text search uses FTS5; other databases search with LIKE instead
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+
+def _image_metadata(connection):
+    ImageMetadata.__table__.create(connection, checkfirst=True)
+
+
+def _numeric_exif(connection):
+    # Values are filled in by `flask backfill-exif`, which reads them from the originals
+    add_column(connection, 'portfolio_image', 'f_number', 'FLOAT')
+    add_column(connection, 'portfolio_image', 'exposure_seconds', 'FLOAT')
+    add_column(connection, 'portfolio_image', 'iso_speed', 'INTEGER')
+    add_column(connection, 'portfolio_image', 'focal_length_mm', 'FLOAT')
+    _create_indexes(connection, ('ix_portfolio_image_f_number', 'ix_portfolio_image_exposure_seconds',
+                                 'ix_portfolio_image_iso_speed', 'ix_portfolio_image_focal_length_mm'))
+
+
+def _perceptual_hashes(connection):
+    # Values are filled in by `flask hash-images`
+    add_column(connection, 'portfolio_image', 'phash', 'VARCHAR(16)')
+    add_column(connection, 'portfolio_image', 'dhash', 'VARCHAR(16)')
+
+
+MIGRATIONS = [
+    (0, 'initial schema', _initial_schema),
+    (1, 'portfolio image processing status', _portfolio_image_status),
+    (2, 'content version counters', _seed_content_versions),
+    (3, 'portfolio image content hash', _portfolio_image_content_hash),
+    (4, 'gallery query indexes', _gallery_indexes),
+    (5, 'default categories', _default_categories),
+    (6, 'portfolio full-text search index', _search_index),
+    (7, 'image metadata table', _image_metadata),
+    (8, 'numeric EXIF columns', _numeric_exif),
+    (9, 'perceptual hashes', _perceptual_hashes),
+]
+
+
+def pending():
+    """Versions not yet applied to the database"""
+    with db.engine.connect() as connection:
+        if not inspect(connection).has_table(schema_migration.name):
+            return [version for version, _, _ in MIGRATIONS]
+        applied = set(connection.execute(select(schema_migration.c.version)).scalars())
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+
+def _lock(connection):
+    """Serialise upgrades across processes for the rest of the transaction"""
+    if connection.dialect.name == 'sqlite':
+        # Take the write lock up front; other upgraders wait on busy_timeout
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+
+
+def upgrade():
+    """Apply pending migrations; returns the versions applied.
+
+    Safe to run from several processes at once: the first takes a lock and
+    migrates, the others wait for it and then find nothing left to do.
+    """
+    if not pending():
+        return []
+    applied_now = []
+    with db.engine.begin() as connection:
+        _lock(connection)
+        schema_migration.create(connection, checkfirst=True)
+        applied = set(connection.execute(select(schema_migration.c.version)).scalars())
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(connection)
+            connection.execute(schema_migration.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+            applied_now.append(version)
+    return applied_now
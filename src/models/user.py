@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import json
+import os
 
 db = SQLAlchemy()
 
@@ -62,47 +64,241 @@ class PortfolioImage(db.Model):
     iso = db.Column(db.String(20))
     focal_length = db.Column(db.String(20))
     date_taken = db.Column(db.DateTime)
+    # The same settings as numbers, for range queries and sorting
+    f_number = db.Column(db.Float)
+    exposure_seconds = db.Column(db.Float)
+    iso_speed = db.Column(db.Integer)
+    focal_length_mm = db.Column(db.Float)
     
     # File metadata
     file_size = db.Column(db.Integer)
     width = db.Column(db.Integer)
     height = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64), unique=True, index=True)  # SHA-256 of the original
+    phash = db.Column(db.String(16))  # perceptual hashes (hex), see services/similarity.py
+    dhash = db.Column(db.String(16))
     
     # Management fields
     is_active = db.Column(db.Boolean, default=True)
+    status = db.Column(db.String(20), default='ready', server_default='ready')  # processing, ready or failed
     sort_order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     categories = db.relationship('Category', secondary=image_categories, backref=db.backref('images', lazy='dynamic'))
+    renditions = db.relationship('ImageRendition', backref='portfolio_image', cascade='all, delete-orphan',
+                                 order_by='ImageRendition.width')
+    image_metadata = db.relationship('ImageMetadata', uselist=False, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<PortfolioImage {self.filename}>'
 
+    @property
+    def image_url(self):
+        return f'/assets/{self.filename}'
+
+    @property
+    def display_url(self):
+        """Full-size image in the best format the browser accepts"""
+        if self.renditions:
+            return f'/img/{self.id}'
+        return self.image_url
+
+    @property
+    def thumbnail_url(self):
+        """Smallest rendition, falling back to the original"""
+        if self.renditions:
+            return f'/img/{self.id}/{self.renditions[0].width}'
+        return self.image_url
+
+    @property
+    def srcset(self):
+        """srcset candidates from the renditions plus the original"""
+        widths = sorted({rendition.width for rendition in self.renditions if rendition.width != self.width})
+        candidates = [f'/img/{self.id}/{width} {width}w' for width in widths]
+        if self.width:
+            candidates.append(f'{self.display_url} {self.width}w')
+        return ', '.join(candidates)
+
+    def variants(self):
+        """(width, format, filename) for the original and every rendition"""
+        original_format = os.path.splitext(self.filename)[1].lstrip('.').lower()
+        variants = [(rendition.width, rendition.format, rendition.filename) for rendition in self.renditions]
+        variants.append((self.width or 0, 'jpg' if original_format == 'jpeg' else original_format, self.filename))
+        return variants
+
+    # Field name -> serializer; lets API callers project only what they need
+    SERIALIZERS = {
+        'id': lambda image: image.id,
+        'filename': lambda image: image.filename,
+        'original_filename': lambda image: image.original_filename,
+        'title': lambda image: image.title,
+        'description': lambda image: image.description,
+        'camera_make': lambda image: image.camera_make,
+        'camera_model': lambda image: image.camera_model,
+        'lens': lambda image: image.lens,
+        'aperture': lambda image: image.aperture,
+        'shutter_speed': lambda image: image.shutter_speed,
+        'iso': lambda image: image.iso,
+        'focal_length': lambda image: image.focal_length,
+        'date_taken': lambda image: image.date_taken.isoformat() if image.date_taken else None,
+        'f_number': lambda image: image.f_number,
+        'exposure_seconds': lambda image: image.exposure_seconds,
+        'iso_speed': lambda image: image.iso_speed,
+        'focal_length_mm': lambda image: image.focal_length_mm,
+        'file_size': lambda image: image.file_size,
+        'content_hash': lambda image: image.content_hash,
+        'width': lambda image: image.width,
+        'height': lambda image: image.height,
+        'image_url': lambda image: image.image_url,
+        'display_url': lambda image: image.display_url,
+        'thumbnail_url': lambda image: image.thumbnail_url,
+        'srcset': lambda image: image.srcset,
+        'renditions': lambda image: [rendition.to_dict() for rendition in image.renditions],
+        'is_active': lambda image: image.is_active,
+        'status': lambda image: image.status,
+        'sort_order': lambda image: image.sort_order,
+        'created_at': lambda image: image.created_at.isoformat() if image.created_at else None,
+        'updated_at': lambda image: image.updated_at.isoformat() if image.updated_at else None,
+        'categories': lambda image: [cat.to_dict() for cat in image.categories],
+        'category_names': lambda image: [cat.name for cat in image.categories]
+    }
+
+    # Compact payload for gallery grids
+    GRID_FIELDS = ('id', 'title', 'description', 'filename', 'original_filename', 'image_url', 'thumbnail_url',
+                   'srcset', 'width', 'height', 'category_names')
+    # What /api/portfolio returned before projections; still its default so existing clients keep working
+    LEGACY_FIELDS = ('id', 'filename', 'original_filename', 'title', 'description', 'camera_make', 'camera_model',
+                     'lens', 'aperture', 'shutter_speed', 'iso', 'focal_length', 'date_taken', 'file_size', 'width',
+                     'height', 'is_active', 'sort_order', 'created_at', 'updated_at', 'categories')
+    # Named projections accepted as fields=<name>
+    PROJECTIONS = {'grid': GRID_FIELDS, 'legacy': LEGACY_FIELDS}
+
+    def to_dict(self, fields=None):
+        """Serialize the image; pass fields to return only those keys"""
+        if fields is None:
+            fields = self.SERIALIZERS
+        return {field: self.SERIALIZERS[field](self) for field in fields if field in self.SERIALIZERS}
+
+# Gallery order: filter_by(is_active, status) then sort_order, newest first
+db.Index('ix_portfolio_image_gallery', PortfolioImage.is_active, PortfolioImage.status, PortfolioImage.sort_order,
+         PortfolioImage.created_at.desc(), PortfolioImage.id.desc())
+# Most recent active image (featured/hero)
+db.Index('ix_portfolio_image_recent', PortfolioImage.is_active, PortfolioImage.created_at)
+db.Index('ix_portfolio_image_date_taken', PortfolioImage.date_taken)
+# Exposure range filters (ISO >= 3200, f/1.4-2.8, ...)
+db.Index('ix_portfolio_image_f_number', PortfolioImage.f_number)
+db.Index('ix_portfolio_image_exposure_seconds', PortfolioImage.exposure_seconds)
+db.Index('ix_portfolio_image_iso_speed', PortfolioImage.iso_speed)
+db.Index('ix_portfolio_image_focal_length_mm', PortfolioImage.focal_length_mm)
+# Category filters join from the category side; the primary key only covers image -> category
+db.Index('ix_image_categories_category', image_categories.c.category_id, image_categories.c.image_id)
+
+class ImageRendition(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    portfolio_image_id = db.Column(db.Integer, db.ForeignKey('portfolio_image.id'), nullable=False, index=True)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImageRendition {self.filename}>'
+
+    @property
+    def url(self):
+        return f'/assets/{self.filename}'
+
     def to_dict(self):
         return {
             'id': self.id,
-            'filename': self.filename,
-            'original_filename': self.original_filename,
-            'title': self.title,
-            'description': self.description,
-            'camera_make': self.camera_make,
-            'camera_model': self.camera_model,
-            'lens': self.lens,
-            'aperture': self.aperture,
-            'shutter_speed': self.shutter_speed,
-            'iso': self.iso,
-            'focal_length': self.focal_length,
-            'date_taken': self.date_taken.isoformat() if self.date_taken else None,
-            'file_size': self.file_size,
             'width': self.width,
             'height': self.height,
-            'is_active': self.is_active,
-            'sort_order': self.sort_order,
+            'format': self.format,
+            'url': self.url,
+            'file_size': self.file_size
+        }
+
+class ImageMetadata(db.Model):
+    """Every metadata block of an original (EXIF, GPS, IPTC, XMP, ICC) as compact JSON"""
+    portfolio_image_id = db.Column(db.Integer, db.ForeignKey('portfolio_image.id'), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ImageMetadata {self.portfolio_image_id}>'
+
+    def to_dict(self):
+        return json.loads(self.data)
+
+class ProcessingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, done or failed
+    portfolio_image_id = db.Column(db.Integer, db.ForeignKey('portfolio_image.id'))
+    payload = db.Column(db.Text)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    # Relationship
+    portfolio_image = db.relationship('PortfolioImage', backref=db.backref('jobs', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<ProcessingJob {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'portfolio_image_id': self.portfolio_image_id,
+            'image_status': self.portfolio_image.status if self.portfolio_image else None,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'categories': [cat.to_dict() for cat in self.categories]
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ContentVersion(db.Model):
+    """Change counter per content group, bumped whenever its rows are written"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ContentVersion {self.name} {self.version}>'
+
+class BackupManifest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(40), unique=True, nullable=False)
+    mode = db.Column(db.String(20), nullable=False)  # full or incremental
+    base_name = db.Column(db.String(40))  # previous backup an incremental builds on
+    asset_count = db.Column(db.Integer, default=0)  # assets whose bytes are in this archive
+    archive_bytes = db.Column(db.BigInteger, default=0)  # uncompressed size of those assets
+    manifest = db.Column(db.Text, nullable=False)  # JSON, as written into the archive
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BackupManifest {self.name}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'mode': self.mode,
+            'base_name': self.base_name,
+            'asset_count': self.asset_count,
+            'archive_bytes': self.archive_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class FeaturedImage(db.Model):
@@ -0,0 +1,122 @@
+"""
+Content versions for cache validation.
+
+Every flush that writes a tracked model bumps the counter of its content
+group inside the same transaction, so a version always matches committed
+data. Readers compare versions (one small SELECT) instead of rebuilding
+payloads to find out whether anything changed.
+"""
+
+from datetime import datetime
+from blinker import Namespace
+from flask import g, has_request_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from src.models.user import (db, PortfolioImage, ImageRendition, Category, FeaturedImage,
+                             BackgroundImage, ContentVersion)
+
+_signals = Namespace()
+
+# Sent after a commit that changed content, with groups={'portfolio', ...}
+content_changed = _signals.signal('content-changed')
+
+# Model -> content group whose version it bumps
+VERSIONED_MODELS = {
+    PortfolioImage: 'portfolio',
+    ImageRendition: 'portfolio',
+    Category: 'categories',
+    FeaturedImage: 'featured',
+    BackgroundImage: 'background',
+}
+
+CONTENT_GROUPS = tuple(sorted(set(VERSIONED_MODELS.values())))
+
+
+def changed_groups(session):
+    """Content groups touched by the pending changes in a session"""
+    groups = set()
+    for obj in list(session.new) + list(session.deleted):
+        group = VERSIONED_MODELS.get(type(obj))
+        if group:
+            groups.add(group)
+    for obj in session.dirty:
+        group = VERSIONED_MODELS.get(type(obj))
+        if group and session.is_modified(obj):
+            groups.add(group)
+    return groups
+
+
+def bump_versions(connection, groups):
+    """Increment the version of each group, creating missing counters"""
+    table = ContentVersion.__table__
+    now = datetime.utcnow()
+    for group in sorted(groups):
+        result = connection.execute(
+            update(table).where(table.c.name == group).values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=group, version=1, updated_at=now))
+
+
+def advance_versions(connection, floor):
+    """Move every group's version past both its current value and floor[group].
+
+    Used after the table is replaced wholesale (a restore), so no version
+    number handed out before is ever reused for different content.
+    """
+    table = ContentVersion.__table__
+    now = datetime.utcnow()
+    current = dict(connection.execute(select(table.c.name, table.c.version)).all())
+    for group in CONTENT_GROUPS:
+        version = max(current.get(group) or 0, floor.get(group) or 0) + 1
+        if group in current:
+            connection.execute(update(table).where(table.c.name == group).values(version=version, updated_at=now))
+        else:
+            connection.execute(insert(table).values(name=group, version=version, updated_at=now))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_after_flush(session, flush_context):
+    groups = changed_groups(session)
+    if groups:
+        bump_versions(session.connection(), groups)
+        session.info.setdefault('changed_groups', set()).update(groups)
+
+
+@event.listens_for(Session, 'after_commit')
+def _announce_after_commit(session):
+    groups = session.info.pop('changed_groups', None)
+    if groups:
+        if has_request_context():
+            g.pop('content_versions', None)
+        content_changed.send(session, groups=groups)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('changed_groups', None)
+
+
+def current_versions(groups):
+    """Return ({group: version}, latest updated_at) for the given groups.
+
+    Memoized for the duration of a request so stacked decorators share one
+    lookup.
+    """
+    groups = tuple(sorted(groups))
+    memo = g.setdefault('content_versions', {}) if has_request_context() else {}
+    if groups not in memo:
+        memo[groups] = _load_versions(groups)
+    return memo[groups]
+
+
+def _load_versions(groups):
+    rows = db.session.query(ContentVersion.name, ContentVersion.version, ContentVersion.updated_at) \
+                     .filter(ContentVersion.name.in_(groups)).all()
+    versions = {group: 0 for group in groups}
+    last_modified = None
+    for name, version, updated_at in rows:
+        versions[name] = version
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return versions, last_modified
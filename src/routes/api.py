@@ -1,31 +1,231 @@
 from flask import Blueprint, jsonify, request
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+import json
 from src.models.user import db, PortfolioImage, Category, FeaturedImage, BackgroundImage, ContactSubmission
+from src.models.loading import image_loader_options, featured_loader_options
+from src.services.cache import cached
+from src.services.http_cache import conditional
+from src.services.metadata import load_metadata, summary
+from src.services.search import FACETS, RANGES, facet_counts, search_filters
+from src.services.similarity import MAX_DISTANCE, similarity_index
 
 api_bp = Blueprint('api', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Metadata comes from the original, which never changes once stored
+METADATA_MAX_AGE = 7 * 24 * 60 * 60
+
+def encode_cursor(image):
+    """Opaque cursor pointing just after the given image in gallery order"""
+    # created_at only has a Python-side default, so rows written outside the ORM may lack it
+    position = [image.sort_order, image.created_at.isoformat() if image.created_at else None, image.id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed input"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_order, created_at, image_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(sort_order), datetime.fromisoformat(created_at) if created_at is not None else None, int(image_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def gallery_query(category=None, cursor=None):
+    """Active, ready images in gallery order, optionally in one category and after a cursor"""
+    query = PortfolioImage.query.filter_by(is_active=True, status='ready')
+    if category and category != 'all':
+        query = query.join(PortfolioImage.categories).filter(Category.name == category)
+    
+    sort_order, created_at = PortfolioImage.sort_order, PortfolioImage.created_at
+    if cursor:
+        last_sort_order, last_created_at, last_id = cursor
+        if last_created_at is None:
+            # Undated rows come last within their sort_order
+            query = query.filter(or_(
+                sort_order > last_sort_order,
+                and_(sort_order == last_sort_order, created_at.is_(None), PortfolioImage.id < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_order > last_sort_order,
+                and_(sort_order == last_sort_order, or_(created_at < last_created_at, created_at.is_(None))),
+                and_(sort_order == last_sort_order, created_at == last_created_at, PortfolioImage.id < last_id)
+            ))
+    return query.order_by(sort_order, created_at.desc().nulls_last(), PortfolioImage.id.desc())
+
+def parse_fields(value, default):
+    """Parse a fields= projection: a field list, a named projection ('grid', 'legacy') or 'all'"""
+    if not value:
+        return default
+    if value == 'all':
+        return None
+    if value in PortfolioImage.PROJECTIONS:
+        return PortfolioImage.PROJECTIONS[value]
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in PortfolioImage.SERIALIZERS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
 @api_bp.route('/portfolio')
+@conditional('portfolio', 'categories')
+@cached('portfolio', 'categories')
 def get_portfolio():
-    """Get all portfolio images"""
+    """Get one page of portfolio images in gallery order.
+
+    Pages are keyset-paginated on (sort_order, created_at desc, id desc), so
+    cost stays flat however deep the client pages. Pass the returned
+    next_cursor as ?cursor= to fetch the following page.
+
+    Images carry the same keys as before projections existed unless the
+    client asks for fewer; the gallery pages request fields=grid.
+    """
     try:
         category_filter = request.args.get('category')
         
-        query = PortfolioImage.query.filter_by(is_active=True)
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            fields = parse_fields(request.args.get('fields'), PortfolioImage.LEGACY_FIELDS)
+            cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = gallery_query(category_filter, cursor).options(*image_loader_options(fields))
+        
+        # Fetch one extra row to learn whether another page exists
+        images = query.limit(limit + 1).all()
+        has_more = len(images) > limit
+        images = images[:limit]
+        
+        return jsonify({
+            'images': [image.to_dict(fields) for image in images],
+            'next_cursor': encode_cursor(images[-1]) if has_more else None
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/portfolio/search')
+@conditional('portfolio', 'categories')
+@cached('portfolio', 'categories')
+def search_portfolio():
+    """Search the portfolio by free text (?q=) and facet values, with facet counts.
+
+    Facet filters are passed by name (?category=, ?camera=, ?lens=, ?aperture=,
+    ?iso=, ?year=). Exposure settings also take inclusive ranges on their
+    indexed numeric columns: ?aperture_min=/?aperture_max= (f-number),
+    ?exposure_min=/?exposure_max= (seconds), ?iso_min=/?iso_max= and
+    ?focal_length_min=/?focal_length_max= (mm). Results come in gallery order and page with next_cursor
+    like /portfolio; facets and total describe the whole result set, so the
+    client can show counts without downloading the catalogue. Pass
+    facets=false to skip counting when only fetching further pages.
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            fields = parse_fields(request.args.get('fields'), PortfolioImage.GRID_FIELDS)
+            cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            filters = {facet: request.args[facet] for facet in FACETS
+                       if request.args.get(facet) and request.args[facet] != 'all'}
+            ranges = {name: (request.args.get(f'{name}_min') or None, request.args.get(f'{name}_max') or None)
+                      for name in RANGES if request.args.get(f'{name}_min') or request.args.get(f'{name}_max')}
+            clauses = search_filters(request.args.get('q'), filters, ranges)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = gallery_query(cursor=cursor).filter(*clauses.values()).options(*image_loader_options(fields))
+        images = query.limit(limit + 1).all()
+        has_more = len(images) > limit
+        images = images[:limit]
+        
+        result = {
+            'images': [image.to_dict(fields) for image in images],
+            'next_cursor': encode_cursor(images[-1]) if has_more else None
+        }
+        if request.args.get('facets') != 'false':
+            result['total'], result['facets'] = facet_counts(clauses)
+        return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/portfolio/image/<int:image_id>/metadata')
+def get_image_metadata(image_id):
+    """Full metadata of an image's original: EXIF, GPS, IPTC, XMP and colour profile.
+
+    The headline fields the lightbox shows (camera, lens, settings, iso,
+    focal_length) come first. Originals are content-addressed, so the
+    response is tagged with the content hash and cached for a week.
+    """
+    try:
+        image = PortfolioImage.query.filter_by(id=image_id, is_active=True).first()
+        if image is None:
+            return jsonify({'error': 'Image not found'}), 404
+        
+        response = jsonify({'id': image.id, **summary(image), **load_metadata(image)})
+        if image.status == 'ready':
+            response.set_etag(image.content_hash or image.filename)
+            response.cache_control.public = True
+            response.cache_control.max_age = METADATA_MAX_AGE
+        else:
+            # EXIF columns are filled in when processing finishes
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/portfolio/<int:image_id>/similar')
+@conditional('portfolio', 'categories')
+@cached('portfolio', 'categories')
+def get_similar_images(image_id):
+    """Images that look like this one, closest first.
+
+    Finds bracketed and burst frames or re-edits of the same shot by
+    perceptual hash. ?max_distance= is how many bits of each 64-bit hash may
+    differ (default SIMILAR_MAX_DISTANCE, at most 32).
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            max_distance = request.args.get('max_distance')
+            if max_distance is not None:
+                max_distance = min(max(int(max_distance), 0), MAX_DISTANCE)
+            fields = parse_fields(request.args.get('fields'), PortfolioImage.GRID_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if category_filter and category_filter != 'all':
-            category = Category.query.filter_by(name=category_filter).first()
-            if category:
-                query = query.filter(PortfolioImage.categories.contains(category))
+        image = PortfolioImage.query.filter_by(id=image_id, is_active=True).first()
+        if image is None:
+            return jsonify({'error': 'Image not found'}), 404
+        if image.phash is None:
+            # Not hashed yet: still processing, or uploaded before hashing (flask hash-images)
+            return jsonify({'id': image.id, 'similar': []})
         
-        images = query.order_by(PortfolioImage.sort_order, PortfolioImage.created_at.desc()).all()
+        matches = similarity_index.similar({'phash': image.phash, 'dhash': image.dhash},
+                                           max_distance, exclude_id=image.id)[:limit]
+        images = PortfolioImage.query.filter(PortfolioImage.id.in_([match[0] for match in matches])) \
+                                     .options(*image_loader_options(fields)).all()
+        images_by_id = {similar.id: similar for similar in images}
         
         return jsonify({
-            'images': [image.to_dict() for image in images]
+            'id': image.id,
+            'similar': [
+                {**images_by_id[similar_id].to_dict(fields),
+                 'distance': {'phash': phash_distance, 'dhash': dhash_distance}}
+                for similar_id, phash_distance, dhash_distance in matches if similar_id in images_by_id
+            ]
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/categories')
+@conditional('categories')
+@cached('categories')
 def get_categories():
     """Get all categories"""
     try:
@@ -39,10 +239,12 @@ def get_categories():
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/featured')
+@conditional('featured', 'portfolio', 'categories')
+@cached('featured', 'portfolio', 'categories')
 def get_featured():
     """Get current featured image"""
     try:
-        featured = FeaturedImage.query.filter_by(is_active=True).first()
+        featured = FeaturedImage.query.options(*featured_loader_options()).filter_by(is_active=True).first()
         
         if not featured:
             return jsonify({'featured': None})
@@ -55,6 +257,7 @@ def get_featured():
         return jsonify({'error': str(e)}), 500
 
 @api_bp.route('/background')
+@conditional('background')
 def get_background():
     """Get current background image"""
     try:
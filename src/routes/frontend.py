@@ -3,8 +3,10 @@ Frontend routes for TheMindsEyeStudio.com photography portfolio website
 """
 
 from flask import Blueprint, render_template, jsonify, request
-from models.database import db, PortfolioImage, Category
+from src.models.user import db, PortfolioImage, Category
 from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
+from src.models.loading import image_loader_options
 import os
 
 # Create frontend blueprint
@@ -27,19 +29,20 @@ def home():
 def portfolio():
     """Portfolio/Gallery page with category filtering"""
     # Get all active categories
-    categories = Category.query.filter_by(is_active=True).all()
+    categories = Category.query.order_by(Category.sort_order).all()
     
     # Get category filter from query params
     category_filter = request.args.get('category')
     
-    # Filter images by category if specified
+    # Filter images by category if specified; tiles render categories and rendition URLs
+    query = PortfolioImage.query.options(*image_loader_options(('categories', 'thumbnail_url', 'srcset')))
     if category_filter:
-        images = PortfolioImage.query.join(PortfolioImage.categories).filter(
+        images = query.join(PortfolioImage.categories).filter(
             Category.name == category_filter,
             PortfolioImage.is_active == True
         ).all()
     else:
-        images = PortfolioImage.query.filter_by(is_active=True).all()
+        images = query.filter_by(is_active=True).all()
     
     return render_template('frontend/portfolio.html',
                          images=images,
@@ -105,29 +108,30 @@ def submit_contact():
 def api_portfolio():
     """API endpoint for portfolio images"""
     category = request.args.get('category')
+    query = PortfolioImage.query.options(selectinload(PortfolioImage.categories))
     
     if category:
-        images = PortfolioImage.query.join(PortfolioImage.categories).filter(
+        images = query.join(PortfolioImage.categories).filter(
             Category.name == category,
             PortfolioImage.is_active == True
         ).all()
     else:
-        images = PortfolioImage.query.filter_by(is_active=True).all()
+        images = query.filter_by(is_active=True).all()
     
     return jsonify([{
         'id': img.id,
         'title': img.title,
         'description': img.description,
         'filename': img.filename,
-        'url': f'/static/assets/{img.filename}',
+        'url': img.image_url,
         'categories': [cat.name for cat in img.categories],
         'created_at': img.created_at.isoformat() if img.created_at else None
     } for img in images])
 
 @frontend_bp.route('/api/categories')
 def api_categories():
-    """API endpoint for active categories"""
-    categories = Category.query.filter_by(is_active=True).all()
+    """API endpoint for categories"""
+    categories = Category.query.order_by(Category.sort_order).all()
     return jsonify([{
         'id': cat.id,
         'name': cat.name,
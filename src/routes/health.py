@@ -0,0 +1,34 @@
+from flask import Blueprint, current_app, jsonify
+from src.models import migrations
+from src.services.startup import bootstrap
+
+health_bp = Blueprint('health', __name__)
+
+def no_store(response, status=200):
+    response = jsonify(response)
+    response.status_code = status
+    response.cache_control.no_store = True
+    return response
+
+@health_bp.route('/healthz')
+@bootstrap.exempt
+def healthz():
+    """Liveness: the process is serving requests; never touches the database"""
+    return no_store({'status': 'ok'})
+
+@health_bp.route('/readyz')
+@bootstrap.exempt
+def readyz():
+    """Readiness: the database answers and the schema is up to date.
+
+    A probe bootstraps the worker, so it is warm before traffic arrives.
+    """
+    try:
+        if current_app.config['AUTO_MIGRATE'] or not migrations.pending():
+            bootstrap.ensure()
+        pending = migrations.pending()
+    except Exception as e:
+        return no_store({'status': 'unavailable', 'error': str(e)}, 503)
+    if pending:
+        return no_store({'status': 'migrating', 'pending_migrations': pending}, 503)
+    return no_store({'status': 'ready'})
@@ -0,0 +1,87 @@
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy.orm import selectinload
+from src.models.user import PortfolioImage
+from src.services.derivatives import derivative_cache
+from src.services.renditions import MIMETYPES, MODERN_FORMATS, OUTPUT_FORMATS
+from src.services.static_assets import IMMUTABLE_MAX_AGE
+from src.services.storage import storage
+
+images_bp = Blueprint('images', __name__)
+
+# Negotiated URLs are stable per image but the chosen file may change when
+# an image is reprocessed, so they are cached for a day rather than forever
+IMAGE_MAX_AGE = 24 * 60 * 60
+
+def accepted_formats():
+    """Modern formats the client lists explicitly in Accept, best first.
+
+    Wildcards are ignored: browsers that cannot decode WebP/AVIF still send
+    ``*/*``, so only an explicit ``image/webp`` or ``image/avif`` counts.
+    """
+    listed = {value for value, quality in request.accept_mimetypes if quality > 0}
+    return [extension for extension in MODERN_FORMATS if MIMETYPES[extension] in listed]
+
+def choose_variant(variants, width, formats):
+    """Pick the smallest variant at least `width` wide, in the best accepted format"""
+    widths = sorted({variant_width for variant_width, _, _ in variants})
+    if width is None:
+        target = widths[-1]
+    else:
+        target = next((candidate for candidate in widths if candidate >= width), widths[-1])
+
+    candidates = {variant_format: filename for variant_width, variant_format, filename in variants
+                  if variant_width == target}
+    for variant_format in formats:
+        if variant_format in candidates:
+            return candidates[variant_format]
+    # Fall back to a format every browser decodes
+    for variant_format in ('jpg', 'png'):
+        if variant_format in candidates:
+            return candidates[variant_format]
+    return next(iter(candidates.values()))
+
+@images_bp.route('/img/<int:image_id>')
+@images_bp.route('/img/<int:image_id>/<int:width>')
+def serve_image(image_id, width=None):
+    """Serve an image at the requested width in the best format the client accepts"""
+    image = PortfolioImage.query.options(selectinload(PortfolioImage.renditions)) \
+                                .filter_by(id=image_id, is_active=True).first()
+    if image is None:
+        abort(404)
+
+    filename = choose_variant(image.variants(), width, accepted_formats())
+    response = storage.send(filename)
+    response.vary.add('Accept')
+    if response.status_code == 200:
+        # Replace whatever the static path chose (no-cache for files it cannot fingerprint)
+        response.cache_control.public = True
+        response.cache_control.no_cache = None
+        response.cache_control.immutable = None
+        response.cache_control.max_age = IMAGE_MAX_AGE
+    return response
+
+@images_bp.route('/img/<int:image_id>/<int:width>x<int:height>.<extension>')
+def serve_derivative(image_id, width, height, extension):
+    """Serve a resized copy of an image, rendering and caching it on first request.
+
+    Give both sides to crop to exactly that box, or 0 for one side to scale
+    proportionally.
+    """
+    if extension not in OUTPUT_FORMATS:
+        abort(404)
+    max_dimension = current_app.config['DERIVATIVE_MAX_DIMENSION']
+    if not (width or height) or width > max_dimension or height > max_dimension:
+        return jsonify({'error': f'Width and height must be between 0 and {max_dimension}, not both 0'}), 400
+
+    image = PortfolioImage.query.filter_by(id=image_id, is_active=True).first()
+    if image is None:
+        abort(404)
+
+    filename = derivative_cache.get(image.filename, width, height, extension)
+    response = derivative_cache.send(filename)
+    # The URL names the image, size and format, so its content never changes
+    response.cache_control.public = True
+    response.cache_control.no_cache = None
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,334 @@
+"""
+Streaming backup and restore.
+
+A backup is a tar archive, compressed with gzip (or zstd when the optional
+``zstandard`` package is installed), written straight to the response a
+chunk at a time. Nothing is staged except the database snapshot, so archive
+size is bounded by the client, not by server memory or disk.
+
+Layout::
+
+    database/app.db    consistent snapshot taken with SQLite's online backup API
+    assets/<key>       originals and renditions from the storage backend
+    manifest.json      every asset with size, mtime, SHA-256 and the backup holding its bytes
+
+An incremental backup only carries assets whose size or mtime changed since
+the previous backup's manifest; its manifest still lists every asset, pointing
+unchanged ones at the earlier archive. Restore streams an archive back,
+staging each member while hashing it, and only applies anything once every
+checksum matches the manifest. Restore a full backup first, then each
+incremental after it in order.
+
+A restored snapshot is migrated to the current schema, and its content
+versions are moved past every number handed out before, so ETags and cached
+responses from before the restore can never match the restored content.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import uuid
+import zlib
+from datetime import datetime
+from flask import g, has_request_context
+from src.models import migrations
+from src.models.user import db, BackupManifest
+from src.models.versioning import CONTENT_GROUPS, advance_versions, current_versions
+from src.services.cache import response_cache
+from src.services.ingest import CHUNK_SIZE
+from src.services.storage import storage
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+MANIFEST_NAME = 'manifest.json'
+DATABASE_NAME = 'database/app.db'
+ASSET_PREFIX = 'assets/'
+# Per-instance caches that can be rebuilt on demand
+EXCLUDED_PREFIXES = ('derivatives/',)
+# Archives are mostly JPEG, which does not compress; favour speed
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+COMPRESSIONS = {'gzip': ('application/gzip', 'tar.gz')}
+if zstandard is not None:
+    COMPRESSIONS['zstd'] = ('application/zstd', 'tar.zst')
+
+
+class BackupError(Exception):
+    """Raised when an archive cannot be created or fails verification"""
+
+
+class TarStream:
+    """Writes a compressed tar archive as a series of byte chunks"""
+
+    def __init__(self, compression):
+        if compression == 'gzip':
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif compression == 'zstd' and zstandard is not None:
+            self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            raise BackupError(f'Unsupported compression: {compression}')
+
+    def _write(self, data):
+        compressed = self.compressor.compress(data)
+        if compressed:
+            yield compressed
+
+    def add(self, name, source, size, mtime):
+        """Yield the compressed member for `size` bytes of `source`; returns their SHA-256"""
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = mtime
+        info.mode = 0o644
+        yield from self._write(info.tobuf(tarfile.PAX_FORMAT))
+
+        digest = hashlib.sha256()
+        remaining = size
+        while remaining:
+            chunk = source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise BackupError(f'{name} changed size while being backed up')
+            digest.update(chunk)
+            remaining -= len(chunk)
+            yield from self._write(chunk)
+
+        yield from self._write(b'\0' * (-size % tarfile.BLOCKSIZE))
+        return digest.hexdigest()
+
+    def close(self):
+        yield from self._write(b'\0' * (2 * tarfile.BLOCKSIZE))
+        yield self.compressor.flush()
+
+
+def database_path():
+    """Path of the SQLite database file behind the app's engine"""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise BackupError('Database backups are only supported for file-based SQLite databases')
+    return url.database
+
+
+def snapshot_database(target_path):
+    """Copy the live database to target_path with SQLite's online backup API.
+
+    The copy is transactionally consistent even while other connections write.
+    """
+    source = sqlite3.connect(database_path())
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def restore_database(source_path):
+    """Replace the live database's contents with a verified snapshot"""
+    db.session.remove()
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(database_path())
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    # Pooled connections may hold pages from the old file
+    db.engine.dispose()
+
+
+def stream_backup(incremental=False, compression='gzip'):
+    """Yield a backup archive; the manifest is recorded once the last byte is produced.
+
+    Must run inside an app context for its whole lifetime (use
+    ``stream_with_context`` when returning it from a view).
+    """
+    archive = TarStream(compression)
+    base = BackupManifest.query.order_by(BackupManifest.id.desc()).first() if incremental else None
+    base_assets = json.loads(base.manifest)['assets'] if base else {}
+
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+    manifest = {
+        'format': 1,
+        'name': name,
+        'mode': 'incremental' if base else 'full',
+        'base': base.name if base else None,
+        'created_at': datetime.utcnow().isoformat(),
+        'assets': {}
+    }
+
+    with tempfile.TemporaryDirectory(prefix='minds-eye-backup-') as folder:
+        snapshot = os.path.join(folder, 'app.db')
+        snapshot_database(snapshot)
+        stat = os.stat(snapshot)
+        with open(snapshot, 'rb') as source:
+            digest = yield from archive.add(DATABASE_NAME, source, stat.st_size, int(stat.st_mtime))
+        manifest['database'] = {'size': stat.st_size, 'sha256': digest}
+
+    asset_count = archive_bytes = 0
+    for key, size, mtime in storage.list():
+        if key.startswith(EXCLUDED_PREFIXES):
+            continue
+        previous = base_assets.get(key)
+        if previous and previous['size'] == size and previous['mtime'] == mtime:
+            manifest['assets'][key] = previous
+            continue
+        with storage.open(key) as source:
+            digest = yield from archive.add(ASSET_PREFIX + key, source, size, mtime)
+        manifest['assets'][key] = {'size': size, 'mtime': mtime, 'sha256': digest, 'backup': name}
+        asset_count += 1
+        archive_bytes += size
+
+    body = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    yield from archive.add(MANIFEST_NAME, io.BytesIO(body), len(body), int(datetime.utcnow().timestamp()))
+    yield from archive.close()
+
+    db.session.add(BackupManifest(
+        name=name, mode=manifest['mode'], base_name=manifest['base'], asset_count=asset_count,
+        archive_bytes=archive_bytes, manifest=body.decode()
+    ))
+    db.session.commit()
+
+
+def restore_backup(stream):
+    """Restore an archive read from a stream; returns a summary of what was applied.
+
+    Members are staged and hashed as they arrive. Nothing is applied unless
+    the manifest is present and every checksum matches it.
+    """
+    with tempfile.TemporaryDirectory(dir=storage.staging_root(), prefix='.restore-') as staging:
+        staged = {}
+        try:
+            manifest = _stage_members(stream, staging, staged)
+        except (tarfile.TarError, EOFError, ValueError, zlib.error) as e:
+            raise BackupError(f'Archive is corrupt or truncated: {e}')
+        if manifest is None:
+            raise BackupError('Archive has no manifest; it is incomplete or not a backup')
+        _verify(manifest, staged)
+
+        versions_before, _ = current_versions(CONTENT_GROUPS)
+        for member_name, (path, _) in staged.items():
+            if member_name != DATABASE_NAME:
+                storage.import_file(member_name[len(ASSET_PREFIX):], path)
+        restore_database(staged[DATABASE_NAME][0])
+
+    # The snapshot may predate later migrations, and this process has already bootstrapped
+    applied = migrations.upgrade()
+    with db.engine.begin() as connection:
+        advance_versions(connection, versions_before)
+    if has_request_context():
+        g.pop('content_versions', None)
+    response_cache.clear()
+
+    # The snapshot predates its own manifest; record it so incrementals can follow on
+    if not BackupManifest.query.filter_by(name=manifest['name']).first():
+        db.session.add(BackupManifest(
+            name=manifest['name'], mode=manifest['mode'], base_name=manifest['base'],
+            asset_count=len(staged) - 1, manifest=json.dumps(manifest, indent=1, sort_keys=True)
+        ))
+        db.session.commit()
+
+    missing = [key for key, entry in manifest['assets'].items()
+               if entry['backup'] != manifest['name'] and not storage.exists(key)]
+    return {
+        'backup': manifest['name'],
+        'mode': manifest['mode'],
+        'assets_restored': len(staged) - 1,
+        'migrations_applied': applied,
+        'missing_from_earlier_backups': missing
+    }
+
+
+def _stage_members(stream, staging, staged):
+    """Write every archive member into the staging folder, hashing it on the way.
+
+    Returns the parsed manifest, or None when the archive has none.
+    """
+    manifest = None
+    with _open_archive(stream) as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            if member.name == MANIFEST_NAME:
+                manifest = json.load(archive.extractfile(member))
+                continue
+            if member.name != DATABASE_NAME and not _is_safe_asset(member.name):
+                raise BackupError(f'Unexpected archive member: {member.name}')
+            path = os.path.join(staging, member.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            digest = hashlib.sha256()
+            source = archive.extractfile(member)
+            with open(path, 'wb') as output:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    output.write(chunk)
+            staged[member.name] = (path, digest.hexdigest())
+    return manifest
+
+
+def _verify(manifest, staged):
+    if DATABASE_NAME not in staged:
+        raise BackupError('Archive has no database snapshot')
+    if staged[DATABASE_NAME][1] != manifest['database']['sha256']:
+        raise BackupError('Checksum mismatch for the database snapshot')
+
+    expected = {ASSET_PREFIX + key: entry['sha256'] for key, entry in manifest['assets'].items()
+                if entry['backup'] == manifest['name']}
+    for member_name, (_, digest) in staged.items():
+        if member_name == DATABASE_NAME:
+            continue
+        if member_name not in expected:
+            raise BackupError(f'{member_name} is not listed in the manifest')
+        if digest != expected[member_name]:
+            raise BackupError(f'Checksum mismatch for {member_name}')
+    absent = set(expected) - set(staged)
+    if absent:
+        raise BackupError(f'{len(absent)} assets listed in the manifest are missing from the archive')
+
+
+def _is_safe_asset(name):
+    if not name.startswith(ASSET_PREFIX):
+        return False
+    parts = name[len(ASSET_PREFIX):].split('/')
+    return all(part and part not in ('.', '..') for part in parts) and not os.path.isabs(name)
+
+
+def _open_archive(stream):
+    """Open a raw archive stream for sequential reading, detecting its compression"""
+    magic = stream.read(4)
+    stream = _Prefixed(magic, stream)
+    if magic.startswith(GZIP_MAGIC):
+        return tarfile.open(fileobj=stream, mode='r|gz')
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise BackupError('Archive is zstd-compressed but the zstandard package is not installed')
+        return tarfile.open(fileobj=zstandard.ZstdDecompressor().stream_reader(stream), mode='r|')
+    return tarfile.open(fileobj=stream, mode='r|')
+
+
+class _Prefixed:
+    """A stream with some already-read bytes put back in front"""
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if self.prefix:
+            if size is None or size < 0:
+                data, self.prefix = self.prefix + self.stream.read(), b''
+                return data
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            if len(data) < size:
+                data += self.stream.read(size - len(data))
+            return data
+        return self.stream.read(size)
@@ -0,0 +1,195 @@
+"""
+Batch ingest: many uploads, or zip archives of them, in one request.
+
+Files are streamed from the multipart body straight into the upload folder,
+hashed on the way, and stored under their content address. Duplicates (of
+stored images or of each other) are flagged before the rest are decoded in
+parallel across CPU cores with a process pool. The caller writes every
+resulting row in a single transaction.
+
+Only views marked with ``allow_batch_body`` accept bodies up to
+BATCH_MAX_CONTENT_LENGTH; everything else keeps MAX_CONTENT_LENGTH. Zip
+archives may expand to at most BATCH_MAX_CONTENT_LENGTH in total, and no
+single image may exceed MAX_CONTENT_LENGTH.
+"""
+
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from flask import Request, current_app
+from PIL import UnidentifiedImageError
+from src.services.ingest import content_filename, copy_hashed
+from src.services.processing import process_original
+
+
+batch_body_views = set()
+
+
+def allow_batch_body(view):
+    """Let a view accept request bodies up to BATCH_MAX_CONTENT_LENGTH"""
+    batch_body_views.add(view)
+    return view
+
+
+class BatchAwareRequest(Request):
+    """Request whose body limit is raised for views marked with allow_batch_body"""
+
+    @property
+    def max_content_length(self):
+        if current_app.view_functions.get(self.endpoint) in batch_body_views:
+            return current_app.config['BATCH_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def process_pool(max_workers):
+    """The process pool batch decoding shares in this process, created on first use"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Pools do not survive fork(), and a pool whose worker died is unusable
+        if _pool is None or _pool_pid != os.getpid() or _pool._broken:
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _stage_file(stream, name, upload_folder):
+    extension = name.rsplit('.', 1)[1].lower()
+    fd, temp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            sha256 = copy_hashed(stream, output)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    filename = content_filename(sha256, extension)
+    path = os.path.join(upload_folder, filename)
+    entry = {'name': name, 'filename': filename, 'path': path, 'sha256': sha256}
+    if os.path.exists(path):
+        # Identical bytes are already stored; never rewrite or later discard them
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        entry['stored'] = True
+    return entry
+
+
+def _stream_size(stream):
+    """Size of a seekable stream (multipart files are spooled, so they all are)"""
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+
+def _zip_members(archive, is_allowed):
+    for member in archive.infolist():
+        basename = os.path.basename(member.filename)
+        if member.is_dir() or member.filename.startswith('__MACOSX/') or basename.startswith('.'):
+            continue
+        if not is_allowed(basename):
+            continue
+        yield member, basename
+
+
+def stage_uploads(files, upload_folder, is_allowed, max_member_size, max_expanded_size):
+    """Write uploaded files (expanding zip archives) into the upload folder.
+
+    Each image, whether uploaded directly or inside an archive, may be at
+    most max_member_size. Archive members count against max_expanded_size
+    together; once it is used up, the rest of the archives is rejected. Returns one entry per
+    image with its original name and stored filename; rejected files get an
+    'error' instead.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    entries = []
+    expanded = 0
+    for file in files:
+        if file.filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    for member, basename in _zip_members(archive, is_allowed):
+                        if member.file_size > max_member_size:
+                            entries.append({'name': basename, 'error': 'File too large'})
+                            continue
+                        # Reads stop at the size the archive declares, so declared sizes bound the output
+                        expanded += member.file_size
+                        if expanded > max_expanded_size:
+                            entries.append({'name': file.filename,
+                                            'error': 'Archives expand beyond the batch size limit'})
+                            break
+                        with archive.open(member) as stream:
+                            entries.append(_stage_file(stream, basename, upload_folder))
+            except zipfile.BadZipFile:
+                entries.append({'name': file.filename, 'error': 'Invalid zip archive'})
+        elif not is_allowed(file.filename):
+            entries.append({'name': file.filename, 'error': 'Invalid file type'})
+        elif _stream_size(file.stream) > max_member_size:
+            entries.append({'name': file.filename, 'error': 'File too large'})
+        else:
+            entries.append(_stage_file(file.stream, file.filename, upload_folder))
+    return entries
+
+
+def mark_duplicates(entries, known_hashes):
+    """Flag entries whose content is already stored or appeared earlier in the batch"""
+    seen = set(known_hashes)
+    for entry in entries:
+        if 'error' in entry:
+            continue
+        if entry['sha256'] in seen:
+            entry['duplicate'] = True
+        seen.add(entry['sha256'])
+    return entries
+
+
+def process_entries(entries, upload_folder, max_workers):
+    """Decode staged files in parallel, storing each result on its entry"""
+    pending = [entry for entry in entries if 'error' not in entry and not entry.get('duplicate')]
+    if not pending:
+        return entries
+
+    pool = process_pool(max_workers)
+    futures = {
+        pool.submit(process_original, entry['path'], entry['filename'], upload_folder): entry
+        for entry in pending
+    }
+    for future in as_completed(futures):
+        entry = futures[future]
+        try:
+            entry['processed'] = future.result()
+        except UnidentifiedImageError:
+            entry['error'] = 'File is not a readable image'
+            discard_entries([entry], upload_folder)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next batch gets a fresh pool
+            entry['error'] = 'Could not process image: decoder process crashed'
+            discard_entries([entry], upload_folder)
+        except Exception as e:
+            entry['error'] = f'Could not process image: {e}'
+            discard_entries([entry], upload_folder)
+    return entries
+
+
+def discard_entries(entries, upload_folder):
+    """Remove the originals and renditions written for the given entries"""
+    for entry in entries:
+        paths = []
+        if entry.get('stored'):
+            paths.append(entry['path'])
+        for rendition in entry.get('processed', {}).get('renditions', []):
+            paths.append(os.path.join(upload_folder, rendition['filename']))
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,198 @@
+"""
+Response cache for gallery endpoints.
+
+Serialized response bodies are stored under a key built from the endpoint,
+its URL arguments (e.g. the image id), the query arguments and the current
+content versions of the groups the view depends on. A write bumps those versions, so no process can serve a stale
+entry, and the commit hook evicts the superseded entries straight away.
+
+Backends are chosen with CACHE_URL:
+
+- ``memory://`` (default) - bounded LRU with TTL, private to each process
+- ``redis://host:6379/0`` - any Redis-protocol server, shared by all workers
+- ``null://`` - caching disabled
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from src.models.versioning import content_changed, current_versions
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags, ttl):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """Thread-safe LRU bounded by entry count and total bytes, with TTL"""
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._tags = {}  # tag -> set of keys
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, tags, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, tags, value)
+            self._size += len(value[1])
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, tags, value = self._entries.pop(key)
+        self._size -= len(value[1])
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend:
+    """Shares entries between worker processes through a Redis-protocol server"""
+
+    def __init__(self, url, prefix='minds-eye:cache'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_URL uses redis:// but the redis package is not installed')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def _tag(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            return None
+        mimetype, _, body = raw.partition(b'\n')
+        return mimetype.decode(), body
+
+    def set(self, key, value, tags, ttl):
+        mimetype, body = value
+        pipe = self.client.pipeline()
+        pipe.setex(self._key(key), ttl, mimetype.encode() + b'\n' + body)
+        for tag in tags:
+            pipe.sadd(self._tag(tag), self._key(key))
+            pipe.expire(self._tag(tag), ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            keys = self.client.smembers(self._tag(tag))
+            self.client.delete(self._tag(tag), *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def backend_from_url(url, config):
+    if url.startswith('memory://'):
+        return MemoryBackend(config['CACHE_MAX_ENTRIES'], config['CACHE_MAX_BYTES'])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    if url.startswith('null://'):
+        return NullBackend()
+    raise ValueError(f'Unsupported CACHE_URL: {url}')
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_URL', 'memory://')
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 512)
+        app.config.setdefault('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self.backend = backend_from_url(app.config['CACHE_URL'], app.config)
+        app.extensions['response_cache'] = self
+        content_changed.connect(self._on_content_changed, weak=False)
+
+    def _on_content_changed(self, sender, groups):
+        self.backend.invalidate(groups)
+
+    def clear(self):
+        """Drop every cached response, e.g. after the database was replaced"""
+        self.backend.clear()
+
+    def cached(self, *groups):
+        """Cache a view's 200 responses until one of `groups` changes"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                versions, _ = current_versions(groups)
+                key = '|'.join([
+                    request.endpoint,
+                    ','.join(f'{name}={value}' for name, value in sorted((request.view_args or {}).items())),
+                    request.query_string.decode('latin-1'),
+                    ','.join(f'{group}={version}' for group, version in sorted(versions.items()))
+                ])
+
+                hit = self.backend.get(key)
+                if hit is not None:
+                    mimetype, body = hit
+                    return current_app.response_class(body, mimetype=mimetype)
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.mimetype, response.get_data()), groups,
+                                     current_app.config['CACHE_TTL'])
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
+cached = response_cache.cached
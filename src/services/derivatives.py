@@ -0,0 +1,177 @@
+"""
+On-demand image derivatives with a size-bounded disk cache.
+
+``/img/<id>/<w>x<h>.<fmt>`` renders a resized (or cropped) copy the first
+time it is requested and serves the stored file afterwards. The cache is
+local to each instance, whatever the storage backend, and lives in
+UPLOAD_FOLDER. When that is inside the static folder (the default), hits go
+through the normal static path, including X-Accel-Redirect offload;
+otherwise they are sent straight from disk.
+
+- Least recently used files are evicted once the cache passes
+  DERIVATIVE_CACHE_MAX_BYTES. Recency is the file's atime, which is set
+  explicitly on every hit and so is shared by all worker processes; mtime is
+  left alone so ETags stay stable.
+- Concurrent first requests for the same derivative collapse into one
+  render: renders hold one of a fixed set of striped locks, a thread lock
+  within the process plus an ``flock`` across processes, and re-check the
+  cache once they hold it.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from PIL import Image
+from src.services.renditions import render_derivative
+from src.services.storage import LocalStorage, storage
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; fall back to in-process locking
+    fcntl = None
+
+DERIVATIVE_FOLDER = 'derivatives'
+LOCK_STRIPES = 64
+# Evict down to this fraction of the limit so eviction does not run on every miss
+EVICT_TO = 0.9
+
+
+class DerivativeCache:
+    def __init__(self, app=None):
+        self.app = None
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._size = None  # estimated bytes on disk, None until first scanned
+        self._size_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DERIVATIVE_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+        app.config.setdefault('DERIVATIVE_MAX_DIMENSION', 4096)
+        self.app = app
+        self._size = None
+        app.extensions['derivative_cache'] = self
+
+    @property
+    def folder(self):
+        return os.path.join(self.app.config['UPLOAD_FOLDER'], DERIVATIVE_FOLDER)
+
+    def filename(self, source_filename, width, height, extension):
+        """Path of a derivative relative to the upload folder"""
+        stem = os.path.splitext(os.path.basename(source_filename))[0]
+        return f'{DERIVATIVE_FOLDER}/{stem}_{width}x{height}.{extension}'
+
+    def get(self, source_filename, width, height, extension):
+        """Return the derivative's path relative to the upload folder, rendering it on a miss"""
+        relative_path = self.filename(source_filename, width, height, extension)
+        path = os.path.join(self.app.config['UPLOAD_FOLDER'], relative_path)
+        if self._touch(path):
+            return relative_path
+
+        stripe = int(hashlib.md5(relative_path.encode()).hexdigest(), 16) % LOCK_STRIPES
+        with self._locks[stripe], self._process_lock(stripe):
+            # Another thread or process may have rendered it while we waited
+            if self._touch(path):
+                return relative_path
+            size = self._render(source_filename, width, height, extension, path)
+
+        self._account(size)
+        return relative_path
+
+    def send(self, relative_path):
+        """Response delivering a cached derivative returned by get()"""
+        return LocalStorage(self.app.config['UPLOAD_FOLDER']).send(relative_path)
+
+    def _touch(self, path):
+        """Mark a cached file as recently used; False when it does not exist"""
+        try:
+            stat = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _process_lock(self, stripe):
+        if fcntl is None:
+            return nullcontext()
+        lock_folder = os.path.join(self.folder, '.locks')
+        os.makedirs(lock_folder, exist_ok=True)
+        return _FileLock(os.path.join(lock_folder, f'{stripe}.lock'))
+
+    def _render(self, source_filename, width, height, extension, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.render-')
+        os.close(fd)
+        try:
+            with storage.open(source_filename) as source, Image.open(source) as image:
+                render_derivative(image, width, height, extension, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return os.path.getsize(path)
+
+    def _account(self, size):
+        with self._size_lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size <= self.app.config['DERIVATIVE_CACHE_MAX_BYTES']:
+                return
+            self._size = self.evict(int(self.app.config['DERIVATIVE_CACHE_MAX_BYTES'] * EVICT_TO))
+
+    def _stats(self):
+        """(atime_ns, size, path) of every cached file"""
+        stats = []
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    stats.append((stat.st_atime_ns, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return stats
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._stats())
+
+    def evict(self, max_bytes):
+        """Delete least recently used derivatives until at most max_bytes remain; returns the total left"""
+        stats = sorted(self._stats())
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in stats:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+derivative_cache = DerivativeCache()
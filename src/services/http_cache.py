@@ -0,0 +1,51 @@
+"""
+Conditional GET support for read APIs.
+
+ETags are derived from the content versions a view depends on plus the
+request's URL and query arguments, so an unchanged resource is answered with a 304
+after a single version lookup, before the view touches any other table.
+"""
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, make_response, request
+from src.models.versioning import current_versions
+
+
+def _cache_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('API_CACHE_MAX_AGE', 60)
+    return response
+
+
+def conditional(*groups):
+    """Answer If-None-Match / If-Modified-Since with 304 while `groups` are unchanged"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions, last_modified = current_versions(groups)
+            if last_modified:
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+            key = (f"{request.endpoint}|{sorted((request.view_args or {}).items())}|"
+                   f"{sorted(request.args.items(multi=True))}|{sorted(versions.items())}")
+            etag = hashlib.sha1(key.encode()).hexdigest()
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                                    and last_modified <= request.if_modified_since)
+            if not_modified:
+                return _cache_headers(current_app.response_class(status=304), etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _cache_headers(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
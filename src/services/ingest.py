@@ -0,0 +1,171 @@
+"""
+Single-pass image ingest.
+
+An upload is read from the request stream exactly once into memory (or a
+stored original is opened from disk) and opened with Pillow exactly once.
+Header, dimensions and EXIF come from that one handle, the bytes are written
+to disk from the same buffer, and the decoded frame is reused for every
+derivative instead of re-reading the saved file.
+
+Originals are stored content-addressed as ``ab/cd/<sha256>.<ext>``. The hash
+is computed while the upload streams in, so identical re-uploads are found
+before anything is written.
+"""
+
+import hashlib
+import io
+import math
+import os
+import tempfile
+from functools import cached_property
+from PIL import Image, ExifTags
+from PIL.ExifTags import TAGS
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def content_filename(sha256, extension):
+    """Content-addressed path of an original relative to the upload folder"""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+
+def copy_hashed(source, output):
+    """Copy a stream in chunks and return the SHA-256 hex digest of its bytes"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        output.write(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a stored file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_atomically(path, write):
+    """Call write(fileobj) on a temporary file and move it to path when complete.
+
+    A crash mid-write never leaves a partial file under a content address,
+    where it would later be mistaken for a stored original.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            write(output)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def exif_number(value):
+    """A positive float from an EXIF value (rational, int, or a tuple of them); None otherwise"""
+    if isinstance(value, (tuple, list)):
+        value = value[0] if value else None
+    try:
+        number = float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return number if math.isfinite(number) and number > 0 else None
+
+
+def normalize_exif(exif):
+    """Numeric exposure settings that can be indexed, compared and sorted"""
+    iso = exif_number(exif.get('ISOSpeedRatings'))
+    return {
+        'f_number': exif_number(exif.get('FNumber')),
+        'exposure_seconds': exif_number(exif.get('ExposureTime')),
+        'iso_speed': round(iso) if iso else None,
+        'focal_length_mm': exif_number(exif.get('FocalLength')),
+    }
+
+
+def extract_exif_data(image):
+    """Extract EXIF data from an opened image"""
+    try:
+        exif_data = image.getexif()
+
+        if not exif_data:
+            return {}
+
+        # Lens and exposure settings live in the Exif sub-IFD, not in IFD0
+        tags = dict(exif_data)
+        tags.update(exif_data.get_ifd(ExifTags.IFD.Exif))
+
+        exif = {}
+        for key, value in tags.items():
+            if key in TAGS:
+                exif[TAGS[key]] = value
+
+        return {
+            'camera_make': exif.get('Make', ''),
+            'camera_model': exif.get('Model', ''),
+            'lens': exif.get('LensModel', ''),
+            'aperture': str(exif.get('FNumber', '')),
+            'shutter_speed': str(exif.get('ExposureTime', '')),
+            'iso': str(exif.get('ISOSpeedRatings', '')),
+            'focal_length': str(exif.get('FocalLength', '')),
+            'date_taken': exif.get('DateTimeOriginal') or exif.get('DateTime', ''),
+            **normalize_exif(exif)
+        }
+    except Exception as e:
+        print(f"Error extracting EXIF: {e}")
+        return {}
+
+
+class IngestedImage:
+    """An image file together with its open Pillow handle"""
+
+    def __init__(self, fileobj, sha256=None):
+        self.fileobj = fileobj
+        self.sha256 = sha256
+        self.file_size = fileobj.seek(0, io.SEEK_END)
+        fileobj.seek(0)
+        # Image.open only parses the header; pixels are decoded on first use
+        self.image = Image.open(fileobj)
+        self.width, self.height = self.image.size
+
+    @cached_property
+    def exif(self):
+        """Parsed EXIF, read on first use so request threads that only store the file skip it"""
+        return extract_exif_data(self.image)
+
+    def save(self, storage, key):
+        """Store the original bytes without re-reading them from the client"""
+        self.fileobj.seek(0)
+        storage.save(key, self.fileobj)
+
+    def close(self):
+        self.image.close()
+        self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def ingest_upload(file_storage):
+    """Read an uploaded file once, hashing it, and parse its header and size"""
+    buffer = io.BytesIO()
+    sha256 = copy_hashed(file_storage.stream, buffer)
+    buffer.seek(0)
+    return IngestedImage(buffer, sha256)
+
+
+def ingest_file(path):
+    """Open a stored original for processing"""
+    return IngestedImage(open(path, 'rb'))
+
+
+def read_exif(path):
+    """EXIF of a stored original; only the header is read"""
+    with ingest_file(path) as upload:
+        return upload.exif
@@ -0,0 +1,121 @@
+"""
+Local background job runner.
+
+Jobs are rows in the ``processing_job`` table, so they survive restarts and
+are visible to every worker process. Each process runs them on a small thread
+pool. A job is claimed with a conditional UPDATE, so when several processes
+resume the same queue only one of them executes any given job.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime, timedelta
+from src.models.user import db, ProcessingJob
+
+
+class JobRunner:
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers = {}
+        self._executor = None
+        self._executor_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_STALE_SECONDS', 600)
+        self.app = app
+        app.extensions['job_runner'] = self
+
+    def handler(self, kind):
+        """Register the function that runs jobs of the given kind"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    @property
+    def executor(self):
+        # Threads do not survive fork(), so each process builds its own pool
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.app.config['JOB_WORKERS'], thread_name_prefix='jobs'
+            )
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def enqueue(self, kind, portfolio_image=None, payload=None):
+        """Add a queued job to the session; call submit() once it is committed"""
+        if kind not in self.handlers:
+            raise ValueError(f'No handler registered for job kind {kind!r}')
+        job = ProcessingJob(
+            kind=kind,
+            portfolio_image=portfolio_image,
+            payload=json.dumps(payload) if payload is not None else None
+        )
+        db.session.add(job)
+        return job
+
+    def submit(self, job_id):
+        """Hand a committed job to the thread pool"""
+        future = self.executor.submit(self._run, job_id)
+        future.add_done_callback(partial(self._log_crash, job_id))
+        return future
+
+    def _log_crash(self, job_id, future):
+        # Handler errors are recorded on the job; anything raised around them
+        # (claiming, recording the failure) would otherwise vanish with the future
+        error = future.exception()
+        if error is not None:
+            self.app.logger.error('Job %s crashed in the runner', job_id, exc_info=error)
+
+    def resume_pending(self):
+        """Requeue jobs left behind by a previous process"""
+        stale_before = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_STALE_SECONDS'])
+        ProcessingJob.query.filter(
+            ProcessingJob.status == 'running',
+            ProcessingJob.started_at < stale_before
+        ).update({'status': 'queued'}, synchronize_session=False)
+        db.session.commit()
+
+        pending = db.session.query(ProcessingJob.id).filter_by(status='queued').all()
+        for (job_id,) in pending:
+            self.submit(job_id)
+        return len(pending)
+
+    def _claim(self, job_id):
+        claimed = ProcessingJob.query.filter_by(id=job_id, status='queued').update({
+            'status': 'running',
+            'started_at': datetime.utcnow(),
+            'attempts': ProcessingJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            if not self._claim(job_id):
+                return
+
+            job = db.session.get(ProcessingJob, job_id)
+            try:
+                result = self.handlers[job.kind](job)
+                job.status = 'done'
+                job.result = json.dumps(result) if result is not None else None
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Job %s (%s) failed', job_id, job.kind)
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                if job.portfolio_image is not None:
+                    job.portfolio_image.status = 'failed'
+                db.session.commit()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,231 @@
+"""
+Full image metadata: EXIF, GPS, IPTC, XMP and the colour profile.
+
+The gallery only needs a handful of EXIF fields, which stay as columns on
+``portfolio_image``. Everything else is parsed once, when the original is
+ingested (or on the first request for an image uploaded before this
+existed), and stored as compact JSON in the ``image_metadata`` side table.
+``/api/portfolio/image/<id>/metadata`` serves it to the lightbox, so gallery
+listings never need to carry EXIF.
+
+Values are reduced to JSON types: rationals become floats, short byte
+strings become text or hex, and large binary blobs (maker notes, embedded
+thumbnails) are replaced by their size so rows stay small.
+"""
+
+import io
+import json
+import xml.etree.ElementTree as ElementTree
+from PIL import ExifTags, Image, IptcImagePlugin, TiffImagePlugin
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db, ImageMetadata
+from src.services.storage import storage
+
+try:
+    from PIL import ImageCms
+except ImportError:  # Pillow built without littlecms
+    ImageCms = None
+
+# Binary values longer than this are summarised instead of stored
+MAX_BINARY_BYTES = 64
+
+# Sub-IFDs merged into the flat EXIF block (GPS gets its own)
+EXIF_IFDS = (ExifTags.IFD.Exif, ExifTags.IFD.Interop)
+
+# IPTC IIM record 2 datasets worth naming; others keep their numeric key
+IPTC_NAMES = {
+    5: 'object_name', 25: 'keywords', 40: 'special_instructions', 55: 'date_created', 80: 'by_line',
+    85: 'by_line_title', 90: 'city', 92: 'sublocation', 95: 'province_state', 100: 'country_code',
+    101: 'country', 105: 'headline', 110: 'credit', 115: 'source', 116: 'copyright_notice',
+    120: 'caption', 122: 'writer',
+}
+
+RDF_NAMESPACE = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+
+
+def to_json_value(value):
+    """Reduce an EXIF/IPTC value to something json.dumps accepts"""
+    if isinstance(value, TiffImagePlugin.IFDRational):
+        return float(value) if value.denominator else None
+    if isinstance(value, bytes):
+        if len(value) > MAX_BINARY_BYTES:
+            return {'binary_bytes': len(value)}
+        try:
+            return value.rstrip(b'\0').decode('ascii')
+        except UnicodeDecodeError:
+            return value.hex()
+    if isinstance(value, str):
+        return value.rstrip('\0')
+    if isinstance(value, (tuple, list)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _named_tags(tags, names):
+    return {names.get(key, str(key)): to_json_value(value) for key, value in tags.items()}
+
+
+def _gps_coordinate(values, reference):
+    try:
+        degrees, minutes, seconds = (float(value) for value in values)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    return round(-coordinate if reference in ('S', 'W') else coordinate, 7)
+
+
+def parse_gps(gps_ifd):
+    """Raw GPS tags plus decimal latitude/longitude/altitude when present"""
+    if not gps_ifd:
+        return {}
+    raw = _named_tags(gps_ifd, ExifTags.GPSTAGS)
+    gps = {'raw': raw}
+    if 'GPSLatitude' in raw and 'GPSLongitude' in raw:
+        latitude = _gps_coordinate(gps_ifd[ExifTags.GPS.GPSLatitude], raw.get('GPSLatitudeRef'))
+        longitude = _gps_coordinate(gps_ifd[ExifTags.GPS.GPSLongitude], raw.get('GPSLongitudeRef'))
+        if latitude is not None and longitude is not None:
+            gps['latitude'], gps['longitude'] = latitude, longitude
+    if isinstance(raw.get('GPSAltitude'), float):
+        # AltitudeRef 1 means below sea level
+        gps['altitude'] = -raw['GPSAltitude'] if raw.get('GPSAltitudeRef') in (1, '\x01') else raw['GPSAltitude']
+    return gps
+
+
+def parse_iptc(image):
+    try:
+        info = IptcImagePlugin.getiptcinfo(image)
+    except Exception:
+        return {}
+    iptc = {}
+    for (record, dataset), value in (info or {}).items():
+        name = IPTC_NAMES.get(dataset, f'{record}:{dataset}') if record == 2 else f'{record}:{dataset}'
+        iptc[name] = to_json_value(value)
+    return iptc
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _xmp_value(element):
+    items = element.findall(f'./*/{RDF_NAMESPACE}li')
+    if items:
+        return [(item.text or '').strip() for item in items]
+    return (element.text or '').strip()
+
+
+def parse_xmp(image):
+    """Flatten the XMP packet's rdf:Description properties into {name: value}"""
+    packet = image.info.get('xmp') or image.info.get('XML:com.adobe.xmp')
+    if not packet:
+        return {}
+    try:
+        # Python's bundled expat rejects entity-expansion attacks
+        root = ElementTree.fromstring(packet)
+    except ElementTree.ParseError:
+        return {}
+    xmp = {}
+    for description in root.iter(f'{RDF_NAMESPACE}Description'):
+        for name, value in description.attrib.items():
+            if not name.startswith(RDF_NAMESPACE):
+                xmp[_local_name(name)] = value
+        for child in description:
+            xmp[_local_name(child.tag)] = _xmp_value(child)
+    return xmp
+
+
+def parse_icc(image):
+    profile = image.info.get('icc_profile')
+    if not profile:
+        return {}
+    icc = {'bytes': len(profile)}
+    if ImageCms is not None:
+        try:
+            parsed = ImageCms.ImageCmsProfile(io.BytesIO(profile)).profile
+            icc['description'] = (parsed.profile_description or '').strip()
+            icc['color_space'] = parsed.xcolor_space.strip()
+            icc['version'] = parsed.version
+        except Exception:
+            pass
+    return icc
+
+
+def extract_metadata(image):
+    """Every metadata block of an opened image, reduced to JSON types"""
+    metadata = {}
+    exif = image.getexif()
+    if exif:
+        metadata['exif'] = _named_tags(exif, ExifTags.TAGS)
+        for ifd in EXIF_IFDS:
+            try:
+                tags = exif.get_ifd(ifd)
+            except KeyError:  # older Pillow only finds Interop through IFD0
+                continue
+            if tags:
+                metadata['exif'].update(_named_tags(tags, ExifTags.TAGS))
+        metadata['exif'].pop('ExifOffset', None)
+        metadata['exif'].pop('GPSInfo', None)
+        metadata['gps'] = parse_gps(exif.get_ifd(ExifTags.IFD.GPSInfo))
+    metadata['iptc'] = parse_iptc(image)
+    metadata['xmp'] = parse_xmp(image)
+    metadata['icc'] = parse_icc(image)
+    return {name: block for name, block in metadata.items() if block}
+
+
+def dumps(metadata):
+    """Compact JSON for storage"""
+    return json.dumps(metadata, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+def load_metadata(portfolio_image):
+    """Stored metadata of an image, parsing the original the first time it is asked for"""
+    if portfolio_image.image_metadata is not None:
+        return portfolio_image.image_metadata.to_dict()
+    with storage.open(portfolio_image.filename) as source, Image.open(source) as image:
+        metadata = extract_metadata(image)
+    portfolio_image.image_metadata = ImageMetadata(data=dumps(metadata))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request stored the same row first
+        db.session.rollback()
+    return metadata
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def exposure_settings(aperture, shutter_speed):
+    """Display string such as 'f/2.8 · 1/250s' from the stored EXIF columns"""
+    parts = []
+    f_number = _number(aperture)
+    if f_number:
+        parts.append(f'f/{f_number:g}')
+    exposure = _number(shutter_speed)
+    if exposure:
+        parts.append(f'1/{round(1 / exposure)}s' if exposure < 1 else f'{exposure:g}s')
+    return ' · '.join(parts) or None
+
+
+def summary(portfolio_image):
+    """The headline fields the lightbox shows"""
+    make, model = portfolio_image.camera_make or '', portfolio_image.camera_model or ''
+    # Many cameras repeat the make in the model name
+    camera = model if make and model.lower().startswith(make.lower()) else f'{make} {model}'.strip()
+    focal_length = _number(portfolio_image.focal_length)
+    return {
+        'camera': camera or None,
+        'lens': portfolio_image.lens or None,
+        'settings': exposure_settings(portfolio_image.aperture, portfolio_image.shutter_speed),
+        'iso': portfolio_image.iso or None,
+        'focal_length': f'{focal_length:g}mm' if focal_length else None,
+        'date_taken': portfolio_image.date_taken.isoformat() if portfolio_image.date_taken else None,
+    }
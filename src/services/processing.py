@@ -0,0 +1,213 @@
+"""
+Post-upload image processing.
+
+``process_original`` is pure (no database or app context) so it can run in
+a background thread for single uploads or in a worker process for batches.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import os
+import click
+from flask import current_app
+from src.models.user import db, PortfolioImage, ImageMetadata, ImageRendition
+from src.services.ingest import file_sha256, ingest_file, read_exif
+from src.services.jobs import job_runner
+from src.services.metadata import dumps, extract_metadata
+from src.services.renditions import MODERN_FORMATS, generate_renditions
+from src.services.similarity import perceptual_hashes, read_hashes
+from src.services.startup import requires_schema
+from src.services.storage import storage
+
+PROCESS_IMAGE = 'process_image'
+
+
+def process_original(path, filename, upload_folder):
+    """Parse EXIF and full metadata, hash and build renditions for a stored original from one open"""
+    with ingest_file(path) as upload:
+        renditions = generate_renditions(upload.image, filename, upload_folder)
+        return {
+            'exif': upload.exif,
+            'metadata': extract_metadata(upload.image),
+            'hashes': perceptual_hashes(upload.image),
+            'width': upload.width,
+            'height': upload.height,
+            'file_size': upload.file_size,
+            'renditions': renditions
+        }
+
+
+def apply_exif(portfolio_image, exif_data):
+    """Copy parsed EXIF (display strings and numeric settings) onto a PortfolioImage row"""
+    portfolio_image.camera_make = exif_data.get('camera_make', '')
+    portfolio_image.camera_model = exif_data.get('camera_model', '')
+    portfolio_image.lens = exif_data.get('lens', '')
+    portfolio_image.aperture = exif_data.get('aperture', '')
+    portfolio_image.shutter_speed = exif_data.get('shutter_speed', '')
+    portfolio_image.iso = exif_data.get('iso', '')
+    portfolio_image.focal_length = exif_data.get('focal_length', '')
+    portfolio_image.f_number = exif_data.get('f_number')
+    portfolio_image.exposure_seconds = exif_data.get('exposure_seconds')
+    portfolio_image.iso_speed = exif_data.get('iso_speed')
+    portfolio_image.focal_length_mm = exif_data.get('focal_length_mm')
+
+    # Parse date_taken if available
+    if exif_data.get('date_taken'):
+        try:
+            portfolio_image.date_taken = datetime.strptime(exif_data['date_taken'], '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            pass
+
+
+def apply_hashes(portfolio_image, hashes):
+    portfolio_image.phash = hashes['phash']
+    portfolio_image.dhash = hashes['dhash']
+
+
+def apply_processed(portfolio_image, processed):
+    """Copy the result of process_original onto a PortfolioImage row"""
+    apply_exif(portfolio_image, processed['exif'])
+    apply_hashes(portfolio_image, processed['hashes'])
+    portfolio_image.file_size = processed['file_size']
+    portfolio_image.width = processed['width']
+    portfolio_image.height = processed['height']
+    portfolio_image.renditions = [ImageRendition(**rendition) for rendition in processed['renditions']]
+    portfolio_image.image_metadata = ImageMetadata(data=dumps(processed['metadata']))
+    portfolio_image.status = 'ready'
+
+
+def process_stored(filename):
+    """Run process_original on a stored original and store the renditions it wrote"""
+    with storage.workspace() as folder:
+        processed = process_original(storage.localize(filename, folder), filename, folder)
+        storage.publish(folder, [rendition['filename'] for rendition in processed['renditions']])
+    return processed
+
+
+@job_runner.handler(PROCESS_IMAGE)
+def process_image(job):
+    """Parse EXIF and build renditions for a freshly uploaded original"""
+    portfolio_image = job.portfolio_image
+    if portfolio_image is None:
+        raise ValueError(f'Job {job.id} has no portfolio image')
+
+    processed = process_stored(portfolio_image.filename)
+    apply_processed(portfolio_image, processed)
+    db.session.flush()
+
+    return {'renditions': len(processed['renditions'])}
+
+
+@click.command('reprocess-images')
+@click.option('--all', 'reprocess_all', is_flag=True, help='Rebuild every image, not only those missing formats.')
+@requires_schema
+def reprocess_images_command(reprocess_all):
+    """Rebuild renditions for images that lack the current modern formats, and retry failed images."""
+    rebuilt = failed = 0
+    query = PortfolioImage.query.filter(PortfolioImage.status.in_(('ready', 'failed'))).order_by(PortfolioImage.id)
+    for portfolio_image in query.all():
+        formats = {rendition.format for rendition in portfolio_image.renditions}
+        if portfolio_image.status == 'ready' and not reprocess_all and formats.issuperset(MODERN_FORMATS):
+            continue
+        try:
+            processed = process_stored(portfolio_image.filename)
+        except Exception as e:
+            failed += 1
+            click.echo(f'{portfolio_image.filename}: {e}', err=True)
+            continue
+        apply_processed(portfolio_image, processed)
+        db.session.commit()
+        rebuilt += 1
+        click.echo(f'{portfolio_image.filename}: {len(processed["renditions"])} renditions')
+    click.echo(f"Reprocessed {rebuilt} images{f', {failed} failed' if failed else ''}")
+
+
+def backfill(query, read, apply, batch_size, workers):
+    """Run read(path) over the originals of every row in query across a process pool.
+
+    Rows are taken in keyset batches over id, so rows that apply() takes out
+    of the query's filter do not shift later pages; each batch is committed.
+    Returns (updated, unreadable).
+    """
+    updated = unreadable = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = query.filter(PortfolioImage.id > last_id).order_by(PortfolioImage.id).limit(batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            with storage.workspace() as folder:
+                readable, paths = [], []
+                for portfolio_image in batch:
+                    try:
+                        path = storage.localize(portfolio_image.filename, folder)
+                    except Exception as e:
+                        path = None
+                        click.echo(f'{portfolio_image.filename}: {e}', err=True)
+                    if path is None or not os.path.exists(path):
+                        unreadable += 1
+                        continue
+                    paths.append(path)
+                    readable.append(portfolio_image)
+                # Each file is quick to read, so workers take a chunk of them at a time
+                chunksize = max(1, len(paths) // (workers * 4))
+                for portfolio_image, result in zip(readable, pool.map(read, paths, chunksize=chunksize)):
+                    apply(portfolio_image, result)
+            db.session.commit()
+            updated += len(readable)
+            click.echo(f'Updated {updated} images')
+    return updated, unreadable
+
+
+@click.command('backfill-exif')
+@click.option('--all', 'backfill_all', is_flag=True, help='Re-read every image, not only those without numeric EXIF.')
+@click.option('--batch-size', default=200, help='Images read and committed per batch.')
+@click.option('--workers', type=int, help='Processes reading originals (default BATCH_WORKERS).')
+@requires_schema
+def backfill_exif_command(backfill_all, batch_size, workers):
+    """Re-read EXIF from stored originals to fill the numeric exposure columns."""
+    query = PortfolioImage.query.filter_by(status='ready')
+    if not backfill_all:
+        query = query.filter(PortfolioImage.f_number.is_(None), PortfolioImage.exposure_seconds.is_(None),
+                             PortfolioImage.iso_speed.is_(None), PortfolioImage.focal_length_mm.is_(None))
+    # Only headers are read
+    updated, unreadable = backfill(query, read_exif, apply_exif, batch_size,
+                                   workers or current_app.config['BATCH_WORKERS'])
+    click.echo(f"Backfilled {updated} images{f', {unreadable} originals unreadable' if unreadable else ''}")
+
+
+@click.command('hash-images')
+@click.option('--all', 'hash_all', is_flag=True, help='Re-hash every image, not only those without hashes.')
+@click.option('--batch-size', default=200, help='Images hashed and committed per batch.')
+@click.option('--workers', type=int, help='Processes decoding originals (default BATCH_WORKERS).')
+@requires_schema
+def hash_images_command(hash_all, batch_size, workers):
+    """Compute perceptual hashes for stored originals, for the similar-image index."""
+    query = PortfolioImage.query.filter_by(status='ready')
+    if not hash_all:
+        query = query.filter(PortfolioImage.phash.is_(None))
+    updated, unreadable = backfill(query, read_hashes, apply_hashes, batch_size,
+                                   workers or current_app.config['BATCH_WORKERS'])
+    click.echo(f"Hashed {updated} images{f', {unreadable} originals unreadable' if unreadable else ''}")
+
+
+@click.command('backfill-content-hashes')
+@click.option('--batch-size', default=200, help='Originals hashed and committed per batch.')
+@click.option('--workers', type=int, help='Processes reading originals (default BATCH_WORKERS).')
+@requires_schema
+def backfill_content_hashes_command(batch_size, workers):
+    """Hash stored originals that have no content hash, so re-uploads of them are detected."""
+    known = {content_hash for content_hash, in db.session.query(PortfolioImage.content_hash)
+                                                   .filter(PortfolioImage.content_hash.isnot(None))}
+
+    def apply_content_hash(portfolio_image, content_hash):
+        # Rows that are already duplicates of each other keep a NULL hash
+        if content_hash not in known:
+            known.add(content_hash)
+            portfolio_image.content_hash = content_hash
+
+    query = PortfolioImage.query.filter(PortfolioImage.content_hash.is_(None))
+    updated, unreadable = backfill(query, file_sha256, apply_content_hash, batch_size,
+                                   workers or current_app.config['BATCH_WORKERS'])
+    click.echo(f"Hashed {updated} originals{f', {unreadable} unreadable' if unreadable else ''}")
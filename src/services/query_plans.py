@@ -0,0 +1,82 @@
+"""
+Query plan checks for the hot gallery queries.
+
+``flask check-query-plans`` runs ``EXPLAIN QUERY PLAN`` on each query below
+and exits non-zero when one reads a whole table instead of an index, or
+sorts in a temporary b-tree when its index should already give the order.
+Run it after touching a hot query or the indexes behind it (and in CI).
+Plans are checked on SQLite only.
+"""
+
+import re
+import sys
+from datetime import datetime
+import click
+from sqlalchemy import desc
+from src.models.user import db, Category, PortfolioImage
+from src.routes.api import gallery_query
+from src.services.search import search_filters
+from src.services.startup import requires_schema
+
+# 'SCAN portfolio_image' since SQLite 3.36, 'SCAN TABLE portfolio_image' before; scans USING INDEX do not match
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+# name -> (query builder, whether its index must provide the order)
+HOT_QUERIES = {
+    'gallery page': (lambda: gallery_query().limit(51), True),
+    'gallery next page': (lambda: gallery_query(cursor=(0, datetime.utcnow(), 0)).limit(51), True),
+    # The planner may start from the category's rows and sort them; either plan is indexed
+    'gallery category page': (lambda: gallery_query('Landscape').limit(51), False),
+    'search page': (lambda: gallery_query().filter(*search_filters('lake', {'camera': 'X'}).values()).limit(51),
+                    True),
+    # Range filters are selective enough to start from their own index
+    'high ISO range': (lambda: gallery_query().filter(*search_filters(ranges={'iso': (3200, None)}).values())
+                                              .limit(51), False),
+    'category by name': (lambda: Category.query.filter_by(name='Landscape'), False),
+    'latest image': (lambda: PortfolioImage.query.filter_by(is_active=True)
+                                                 .order_by(desc(PortfolioImage.created_at)).limit(1), True),
+    'image by content hash': (lambda: PortfolioImage.query.filter_by(content_hash='0' * 64), False),
+}
+
+
+def explain(query):
+    """EXPLAIN QUERY PLAN detail lines for a query"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    # Plans do not depend on parameter values without sqlite_stat4
+    params = (None,) * len(compiled.positiontup or ())
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled.string}', params)
+    return [row[-1] for row in rows]
+
+
+def plan_problems(plan, ordered):
+    problems = [f'full scan of {match.group(1)}' for match in map(FULL_SCAN.match, plan) if match]
+    if ordered and TEMP_SORT in plan:
+        problems.append('sorts in a temporary b-tree')
+    return problems
+
+
+@click.command('check-query-plans')
+@click.option('--verbose', '-v', is_flag=True, help='Print every plan, not only failing ones.')
+@requires_schema
+def check_query_plans_command(verbose):
+    """Fail if a hot query falls back to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        click.echo(f'Query plans are only checked on SQLite, not {db.engine.dialect.name}')
+        return
+
+    failed = 0
+    for name, (build, ordered) in HOT_QUERIES.items():
+        plan = explain(build())
+        problems = plan_problems(plan, ordered)
+        if problems:
+            failed += 1
+        if problems or verbose:
+            click.echo(f"{'FAIL' if problems else 'ok':<6} {name}: {'; '.join(problems) or 'indexed'}")
+            for line in plan:
+                click.echo(f'       {line}')
+        else:
+            click.echo(f"{'ok':<6} {name}")
+    if failed:
+        click.echo(f'{failed} of {len(HOT_QUERIES)} hot queries are not served by an index')
+        sys.exit(1)
@@ -0,0 +1,186 @@
+"""
+Responsive renditions for portfolio images.
+
+Every upload gets a set of fixed-width, downscaled copies so galleries can use
+``srcset`` instead of shipping multi-megabyte originals to the browser. Each
+width is written as JPEG (or PNG when the image has transparency), which every
+browser decodes, plus WebP and, when Pillow has an AVIF encoder, AVIF for
+clients that advertise them in ``Accept``.
+"""
+
+import math
+import mimetypes
+import os
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF plugin on Pillow < 11.2
+except ImportError:
+    pass
+
+RENDITION_WIDTHS = (320, 800, 1600, 2560)
+RENDITION_FOLDER = 'renditions'
+JPEG_QUALITY = 82
+ORIENTATION_TAG = 0x0112
+
+# Load every Pillow plugin so Image.SAVE lists the encoders actually available
+Image.init()
+
+# Modern formats, most compact first: extension -> (Pillow format, save options)
+MODERN_FORMATS = {
+    extension: options
+    for extension, options in (
+        ('avif', ('AVIF', {'quality': 55, 'speed': 6})),
+        ('webp', ('WEBP', {'quality': 80, 'method': 4})),
+    )
+    if options[0] in Image.SAVE
+}
+
+# WebP cannot encode larger frames
+MAX_MODERN_DIMENSION = 16383
+
+MIMETYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'avif': 'image/avif',
+}
+
+# Extension -> (Pillow format, save options) for every format we can write
+OUTPUT_FORMATS = {
+    'jpg': ('JPEG', {'quality': JPEG_QUALITY, 'progressive': True, 'optimize': True}),
+    'png': ('PNG', {'optimize': True}),
+    **MODERN_FORMATS,
+}
+
+for _extension, _mimetype in MIMETYPES.items():
+    mimetypes.add_type(_mimetype, f'.{_extension}')
+
+
+def rendition_filename(filename, width, extension):
+    """Path of a rendition relative to the upload folder"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return f"{RENDITION_FOLDER}/{stem}_{width}.{extension}"
+
+
+def _prepare_source(image):
+    """Apply EXIF orientation and normalise the colour mode for encoding"""
+    source = ImageOps.exif_transpose(image)
+    has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+    if has_alpha:
+        return source.convert('RGBA'), True
+    if source.mode != 'RGB':
+        source = source.convert('RGB')
+    return source, False
+
+
+def _apply_draft(image, widths):
+    """Let the JPEG decoder downscale in the DCT domain when that is lossless for us.
+
+    Returns the oriented width of the original, measured before drafting.
+    """
+    orientation = image.getexif().get(ORIENTATION_TAG, 1)
+    rotated = orientation in (5, 6, 7, 8)
+    original_width = image.height if rotated else image.width
+
+    targets = [width for width in widths if width < original_width]
+    if image.format == 'JPEG' and targets:
+        # draft() keeps both sides at or above the requested size
+        requested = (1, max(targets)) if rotated else (max(targets), 1)
+        image.draft('RGB', requested)
+
+    return original_width
+
+
+def _save(image, output_path, save_format, options, icc_profile):
+    save_kwargs = dict(options)
+    if icc_profile:
+        save_kwargs['icc_profile'] = icc_profile
+    image.save(output_path, save_format, **save_kwargs)
+
+
+def generate_renditions(image, filename, upload_folder, widths=RENDITION_WIDTHS):
+    """Write downscaled copies of an opened image and return their metadata.
+
+    The image must not have been decoded yet. Widths at or above the
+    original width are skipped; the original is the largest candidate in the
+    srcset. Renditions are produced largest first, each one resized from the
+    previous, so the decoded frame is only resampled once. When the decoder
+    delivered the full-size frame, modern formats are also written at the
+    original width so the original itself has a compact alternative.
+    """
+    original_width = _apply_draft(image, widths)
+    source, has_alpha = _prepare_source(image)
+    base_extension, base_format = ('png', 'PNG') if has_alpha else ('jpg', 'JPEG')
+    base_options = {'optimize': True}
+    if base_format == 'JPEG':
+        base_options.update(quality=JPEG_QUALITY, progressive=True)
+    icc_profile = image.info.get('icc_profile')
+
+    os.makedirs(os.path.join(upload_folder, RENDITION_FOLDER), exist_ok=True)
+
+    targets = [width for width in sorted(set(widths), reverse=True) if width < original_width]
+    if source.width == original_width and max(source.size) <= MAX_MODERN_DIMENSION:
+        targets.insert(0, original_width)
+
+    renditions = []
+    current = source
+    for width in targets:
+        if width == original_width:
+            height = source.height
+            formats = {}
+        else:
+            height = max(1, round(source.height * width / source.width))
+            current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            formats = {base_extension: (base_format, base_options)}
+        formats.update(MODERN_FORMATS)
+
+        for extension, (save_format, options) in formats.items():
+            relative_path = rendition_filename(filename, width, extension)
+            output_path = os.path.join(upload_folder, relative_path)
+            _save(current, output_path, save_format, options, icc_profile)
+            renditions.append({
+                'width': width,
+                'height': height,
+                'format': extension,
+                'filename': relative_path,
+                'file_size': os.path.getsize(output_path)
+            })
+
+    renditions.reverse()
+    return renditions
+
+
+def render_derivative(image, width, height, extension, output_path):
+    """Write one resized or cropped copy of an opened, undecoded image.
+
+    With both sides given the image is scaled to cover the box and
+    centre-cropped to exactly ``width`` x ``height``; with one side 0 it is
+    scaled proportionally. The result is never larger than the original.
+    """
+    orientation = image.getexif().get(ORIENTATION_TAG, 1)
+    rotated = orientation in (5, 6, 7, 8)
+    original_width, original_height = (image.height, image.width) if rotated else image.size
+
+    if width and height:
+        scale = min(1, max(width / original_width, height / original_height))
+    else:
+        scale = min(1, width / original_width if width else height / original_height)
+    scaled_width = max(1, math.ceil(original_width * scale))
+    scaled_height = max(1, math.ceil(original_height * scale))
+
+    _apply_draft(image, [scaled_width])
+    source, has_alpha = _prepare_source(image)
+    if width and height:
+        box = (min(width, scaled_width), min(height, scaled_height))
+        result = ImageOps.fit(source, box, Image.LANCZOS)
+    else:
+        result = source.resize((scaled_width, scaled_height), Image.LANCZOS, reducing_gap=3.0)
+
+    save_format, options = OUTPUT_FORMATS[extension]
+    if has_alpha and save_format == 'JPEG':
+        flattened = Image.new('RGB', result.size, (255, 255, 255))
+        flattened.paste(result, mask=result.getchannel('A'))
+        result = flattened
+    _save(result, output_path, save_format, options, image.info.get('icc_profile'))
+    return result.size
@@ -0,0 +1,176 @@
+"""
+Full-text and faceted search over the portfolio.
+
+On SQLite, ``portfolio_search`` is an FTS5 index over the title,
+description, lens and camera columns of ``portfolio_image``. Triggers keep it
+current on every insert, update and delete, so nothing is ever re-indexed in
+bulk (migration 6 creates it and indexes existing rows). Other databases fall
+back to case-insensitive LIKE matching.
+
+Facet counts are disjunctive: each facet is counted with every filter applied
+except its own, so choosing a category still shows how many images the other
+categories hold. Every facet and the total come back from one UNION ALL query.
+"""
+
+import math
+import re
+from sqlalchemy import String, and_, cast, column, extract, func, literal, literal_column, or_, select, table, union_all
+from src.models.user import db, image_categories, Category, PortfolioImage
+
+SEARCH_TABLE = 'portfolio_search'
+SEARCH_COLUMNS = ('title', 'description', 'lens', 'camera_make', 'camera_model')
+# Most values returned per facet; every category is counted, since the gallery shows each as a button
+FACET_LIMIT = 50
+
+FACETS = {
+    'category': Category.name,
+    'camera': PortfolioImage.camera_model,
+    'lens': PortfolioImage.lens,
+    'aperture': PortfolioImage.aperture,
+    'iso': PortfolioImage.iso,
+    'year': extract('year', PortfolioImage.date_taken),
+}
+
+# Range filters on the numeric EXIF columns: ?iso_min=3200&aperture_min=1.4&aperture_max=2.8
+RANGES = {
+    'aperture': PortfolioImage.f_number,
+    'exposure': PortfolioImage.exposure_seconds,
+    'iso': PortfolioImage.iso_speed,
+    'focal_length': PortfolioImage.focal_length_mm,
+}
+
+search_index = table(SEARCH_TABLE, column('rowid'))
+
+
+def create_search_index(connection):
+    """Create the FTS5 index and the triggers that keep it current, then index existing rows"""
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{name}' for name in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{name}' for name in SEARCH_COLUMNS)
+    delete_old = (f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f'INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});'
+
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5({columns}, "
+        f"content='portfolio_image', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    connection.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON portfolio_image '
+        f'BEGIN {insert_new} END'
+    )
+    connection.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON portfolio_image '
+        f'BEGIN {delete_old} END'
+    )
+    # Only changes to indexed columns touch the index
+    connection.exec_driver_sql(
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF {columns} ON portfolio_image '
+        f'BEGIN {delete_old} {insert_new} END'
+    )
+    connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(text):
+    """FTS5 query matching every word of `text` as a prefix; None when it has no words"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+
+def text_filter(text):
+    """Clause restricting PortfolioImage to rows matching free text"""
+    if db.engine.dialect.name == 'sqlite':
+        expression = match_expression(text)
+        matches = select(search_index.c.rowid).where(literal_column(SEARCH_TABLE).op('MATCH')(expression))
+        return PortfolioImage.id.in_(matches)
+    columns = [getattr(PortfolioImage, name) for name in SEARCH_COLUMNS]
+    return and_(*[or_(*[col.ilike(f'%{word}%') for col in columns]) for word in re.findall(r'\w+', text)])
+
+
+def facet_filter(facet, value):
+    """Clause restricting PortfolioImage to one facet value; raises ValueError for bad input"""
+    if facet == 'category':
+        return PortfolioImage.categories.any(Category.name == value)
+    if facet == 'year':
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError('year must be a number')
+    return FACETS[facet] == value
+
+
+def range_filter(name, minimum=None, maximum=None):
+    """Clause bounding a numeric EXIF column (inclusive); raises ValueError for bad input"""
+    column = RANGES[name]
+    clauses = []
+    for bound, compare in ((minimum, column.__ge__), (maximum, column.__le__)):
+        if bound is None:
+            continue
+        try:
+            bound = float(bound)
+        except ValueError:
+            raise ValueError(f'{name} bounds must be numbers')
+        # float() also accepts 'nan' and 'inf', which no stored setting compares with usefully
+        if not math.isfinite(bound):
+            raise ValueError(f'{name} bounds must be finite numbers')
+        clauses.append(compare(bound))
+    return and_(*clauses)
+
+
+def search_filters(text=None, filters=None, ranges=None):
+    """{name: clause} for free text (under 'q'), each facet filter and each range (under '<name>_range')
+
+    `ranges` maps a RANGES name to a (minimum, maximum) pair; either may be None.
+    """
+    clauses = {}
+    if text and re.search(r'\w', text):
+        clauses['q'] = text_filter(text)
+    for facet, value in (filters or {}).items():
+        clauses[facet] = facet_filter(facet, value)
+    for name, (minimum, maximum) in (ranges or {}).items():
+        clauses[f'{name}_range'] = range_filter(name, minimum, maximum)
+    return clauses
+
+
+def visible_images(*clauses):
+    return select(PortfolioImage.id).where(PortfolioImage.is_active == True, PortfolioImage.status == 'ready',
+                                           *clauses)
+
+
+def facet_counts(clauses):
+    """Total matches and the top values of every facet (every category), in one query.
+
+    Returns ``(total, {facet: [{'value': ..., 'count': ...}, ...]})``.
+    """
+    parts = [select(literal('total').label('facet'), literal(None, String).label('value'),
+                    func.count().label('count')).select_from(visible_images(*clauses.values()).subquery())]
+    for facet, expression in FACETS.items():
+        others = [clause for name, clause in clauses.items() if name != facet]
+        matching = visible_images(*others).subquery()
+        # Values are returned as text so every part of the union has the same type
+        query = select(literal(facet).label('facet'), cast(expression, String).label('value'),
+                       func.count().label('count'))
+        if facet == 'category':
+            query = query.select_from(matching.join(image_categories, image_categories.c.image_id == matching.c.id)
+                                              .join(Category, Category.id == image_categories.c.category_id))
+        else:
+            query = query.select_from(matching.join(PortfolioImage, PortfolioImage.id == matching.c.id)) \
+                         .where(expression.isnot(None))
+            if facet != 'year':
+                # EXIF fields are stored as '' when the camera did not record them
+                query = query.where(expression != '')
+        query = query.group_by(expression).order_by(func.count().desc(), expression)
+        if facet != 'category':
+            query = query.limit(FACET_LIMIT)
+        top = query.subquery()
+        parts.append(select(top.c.facet, top.c.value, top.c['count']))
+
+    total = 0
+    facets = {facet: [] for facet in FACETS}
+    for facet, value, count in db.session.execute(union_all(*parts)):
+        if facet == 'total':
+            total = count
+        else:
+            facets[facet].append({'value': value, 'count': count})
+    return total, facets
@@ -0,0 +1,175 @@
+"""
+Perceptual hashes and the similar-image index.
+
+Every original gets two 64-bit perceptual hashes at ingest, computed with
+NumPy from a small grayscale copy of the decoded frame:
+
+- pHash: the sign of the lowest 8x8 DCT coefficients against their median.
+  Robust to exposure, contrast and compression changes.
+- dHash: whether each pixel is brighter than its right-hand neighbour on a
+  9x8 grid. Cheap and sensitive to composition.
+
+Two images are similar when both hashes are within ``max_distance`` bits
+(Hamming distance), which is what bracketed or burst frames look like.
+
+The hashes are stored on ``portfolio_image`` as hex strings. Each process
+builds a BK-tree over the pHashes from them the first time it is asked, and
+rebuilds it after the portfolio content version changes. A lookup then
+visits only the branches that can hold a match instead of every image.
+"""
+
+import threading
+import numpy as np
+from PIL import Image
+from src.models.user import db, ContentVersion, PortfolioImage
+
+# Side of the grayscale frame the pHash DCT runs on
+PHASH_SIZE = 32
+# Bits out of 64 two frames of the same scene may differ by
+DEFAULT_MAX_DISTANCE = 10
+# Unrelated images already differ in about half their bits
+MAX_DISTANCE = 32
+
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II basis, so dct(pixels) = D @ pixels @ D.T"""
+    frequencies = np.arange(size)[:, None]
+    positions = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * positions + 1) * frequencies / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX = _dct_matrix(PHASH_SIZE)
+
+
+def _pack(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def _grayscale(image, size):
+    if image.mode not in ('L', 'RGB', 'RGBA'):
+        image = image.convert('RGB')
+    # reducing_gap lets Pillow shrink large frames by whole factors first
+    return np.asarray(image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0).convert('L'), dtype=np.float64)
+
+
+def phash(image):
+    pixels = _grayscale(image, (PHASH_SIZE, PHASH_SIZE))
+    low = (DCT_MATRIX @ pixels @ DCT_MATRIX.T)[:8, :8]
+    # The DC term is overall brightness; leaving it out of the median keeps exposure out of the hash
+    return _pack(low > np.median(low.ravel()[1:]))
+
+
+def dhash(image):
+    pixels = _grayscale(image, (9, 8))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hashes(image):
+    """{'phash': hex, 'dhash': hex} for an opened image"""
+    return {'phash': f'{phash(image):016x}', 'dhash': f'{dhash(image):016x}'}
+
+
+def read_hashes(path):
+    """perceptual_hashes of a stored original"""
+    with Image.open(path) as image:
+        # JPEGs decode straight to a fraction of their size; nothing finer than PHASH_SIZE is needed
+        image.draft('RGB', (PHASH_SIZE * 4, PHASH_SIZE * 4))
+        return perceptual_hashes(image)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over 64-bit hashes; each node holds every item with exactly its hash"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, key, item):
+        self.size += 1
+        if self.root is None:
+            self.root = (key, [item], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (key, [item], {})
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """(distance, item) for every item within max_distance of key"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_key, items, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= max_distance:
+                found.extend((distance, item) for item in items)
+            # Triangle inequality: only children at distance d +- max_distance can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class SimilarityIndex:
+    def __init__(self, app=None):
+        self.app = None
+        self._tree = None
+        self._version = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SIMILAR_MAX_DISTANCE', DEFAULT_MAX_DISTANCE)
+        self.app = app
+        app.extensions['similarity_index'] = self
+
+    def _portfolio_version(self):
+        return db.session.query(ContentVersion.version).filter_by(name='portfolio').scalar() or 0
+
+    def tree(self):
+        """BK-tree over the pHashes of visible images, rebuilt when the portfolio changes.
+
+        Call it outside a write transaction, so the version read is a committed one.
+        """
+        version = self._portfolio_version()
+        if self._version == version:
+            return self._tree
+        with self._lock:
+            if self._version != version:
+                rows = db.session.query(PortfolioImage.id, PortfolioImage.phash, PortfolioImage.dhash) \
+                                 .filter(PortfolioImage.is_active == True, PortfolioImage.status == 'ready',
+                                         PortfolioImage.phash.isnot(None)).all()
+                tree = BKTree()
+                for image_id, image_phash, image_dhash in rows:
+                    tree.add(int(image_phash, 16), (image_id, int(image_dhash, 16)))
+                self._tree, self._version = tree, version
+        return self._tree
+
+    def similar(self, hashes, max_distance=None, exclude_id=None):
+        """[(image_id, phash_distance, dhash_distance)] closest first, for images within max_distance on both hashes"""
+        if max_distance is None:
+            max_distance = self.app.config['SIMILAR_MAX_DISTANCE']
+        image_dhash = int(hashes['dhash'], 16)
+        matches = []
+        for phash_distance, (image_id, candidate_dhash) in self.tree().search(int(hashes['phash'], 16), max_distance):
+            dhash_distance = hamming(image_dhash, candidate_dhash)
+            if image_id != exclude_id and dhash_distance <= max_distance:
+                matches.append((image_id, phash_distance, dhash_distance))
+        return sorted(matches, key=lambda match: (match[1] + match[2], match[0]))
+
+
+similarity_index = SimilarityIndex()
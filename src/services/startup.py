@@ -0,0 +1,159 @@
+"""
+Deferred startup work and startup profiling.
+
+``create_app()`` only builds the application; nothing touches the database
+until a request arrives. The first request each process serves runs the
+bootstrap: apply pending migrations (a single query once the schema is up to
+date, serialised across processes), resume interrupted jobs and compile the
+templates.
+
+Deployments can migrate once per release instead, with ``flask bootstrap``
+as the release step, and set ``AUTO_MIGRATE=0`` so workers never check.
+Maintenance commands that read the schema are wrapped in ``requires_schema``
+so they migrate first too (or refuse, with ``AUTO_MIGRATE=0``).
+``flask profile-startup`` shows where a cold start spends its time.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import click
+from functools import wraps
+from flask import current_app, request
+from src.models import migrations
+from src.services.jobs import job_runner
+from src.services.templates import templates
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Runs in a fresh interpreter so every import is cold
+PROFILE_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from src.main import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+from src.models import migrations
+with app.app_context():
+    pending = migrations.pending()
+checked = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported,
+                  "schema_check": checked - created, "pending": pending}))
+'''
+
+
+class Bootstrap:
+    def __init__(self, app=None):
+        self.app = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.exempt_views = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTO_MIGRATE', True)
+        self.app = app
+        self._pid = None
+        app.extensions['bootstrap'] = self
+        app.before_request(self._before_request)
+        app.cli.add_command(bootstrap_command)
+        app.cli.add_command(profile_startup_command)
+
+    def exempt(self, view):
+        """Serve a view without waiting for the bootstrap, e.g. a liveness probe"""
+        self.exempt_views.add(view)
+        return view
+
+    def _before_request(self):
+        if current_app.view_functions.get(request.endpoint) not in self.exempt_views:
+            self.ensure()
+
+    def ensure(self):
+        """Run the bootstrap once in this process"""
+        # A forked worker inherits the flag but not the job threads, so track the pid
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.run()
+                self._pid = os.getpid()
+
+    def run(self):
+        """Run the deferred startup work; returns the migration versions applied"""
+        applied = migrations.upgrade() if self.app.config['AUTO_MIGRATE'] else []
+        job_runner.resume_pending()
+        templates.warm()
+        return applied
+
+
+def requires_schema(command):
+    """Apply pending migrations before a CLI command runs, or refuse with AUTO_MIGRATE=0"""
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        if current_app.config['AUTO_MIGRATE']:
+            applied = migrations.upgrade()
+            if applied:
+                click.echo(f"Applied migrations {', '.join(map(str, applied))}")
+        elif migrations.pending():
+            raise click.ClickException('The database schema is out of date; run `flask bootstrap` first')
+        return command(*args, **kwargs)
+    return wrapper
+
+
+@click.command('bootstrap')
+def bootstrap_command():
+    """Apply pending database migrations."""
+    applied = migrations.upgrade()
+    if applied:
+        click.echo(f"Applied migrations {', '.join(map(str, applied))}")
+    else:
+        click.echo('Database is up to date')
+
+
+def parse_importtime(output):
+    """(cumulative_us, self_us, depth, module) for each line of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # One space after the separator, then two per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return imports
+
+
+@click.command('profile-startup')
+@click.option('--limit', default=20, help='Number of modules to list.')
+@click.option('--depth', default=2, help='Deepest level of the import graph to list.')
+def profile_startup_command(limit, depth):
+    """Time a cold start: imports, app creation and the schema check."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': PROJECT_ROOT}
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise click.ClickException(f'Startup failed:\n{result.stderr[-2000:]}')
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+
+    click.echo(f'Process start to ready: {wall * 1000:.0f} ms (includes interpreter start-up)')
+    click.echo(f"  imports       {phases['import'] * 1000:7.0f} ms")
+    click.echo(f"  create_app()  {phases['create_app'] * 1000:7.0f} ms")
+    click.echo(f"  schema check  {phases['schema_check'] * 1000:7.0f} ms"
+               f"{' (pending: ' + ', '.join(map(str, phases['pending'])) + ')' if phases['pending'] else ''}")
+
+    imports = [entry for entry in parse_importtime(result.stderr) if entry[2] <= depth]
+    click.echo(f'\nSlowest imports (cumulative / self, ms), depth <= {depth}:')
+    for cumulative_us, self_us, level, name in sorted(imports, reverse=True)[:limit]:
+        click.echo(f"  {cumulative_us / 1000:7.1f} {self_us / 1000:7.1f}  {'  ' * level}{name}")
+
+
+bootstrap = Bootstrap()
@@ -0,0 +1,207 @@
+"""
+Static file serving tuned for production.
+
+- ``url_for('static', ...)`` URLs carry a content fingerprint (``?v=<hash>``)
+  so CSS/JS can be cached forever and still update on deploy.
+- Uploaded assets are named by UUID and never change, so they are marked
+  immutable; everything else is revalidated with its ETag.
+- Range and conditional requests are handled by ``send_from_directory``.
+- Text assets are served from precompressed ``.br``/``.gz`` siblings when
+  the client accepts them. Siblings are built by ``flask precompress-static``
+  at deploy time, or lazily on first request, and rebuilt whenever the
+  source's mtime changes, so nothing is compressed per request.
+- With STATIC_ACCEL_REDIRECT set (e.g. ``/_static/``) responses carry an
+  nginx ``X-Accel-Redirect`` header instead of a body; with Flask's own
+  USE_X_SENDFILE they carry ``X-Sendfile``. Either way the front proxy
+  streams the bytes instead of a Python worker.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import click
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.html', '.svg', '.json', '.txt', '.xml'}
+MIN_COMPRESS_SIZE = 512
+
+# Content-Encoding -> (sibling suffix, compress function), best first
+ENCODINGS = {}
+if brotli is not None:
+    ENCODINGS['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+ENCODINGS['gzip'] = ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+
+# <uuid>.<ext> or <sha256>.<ext> originals and their <name>_<width>.<ext> renditions
+IMMUTABLE_ASSET = re.compile(r'^([0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}|[0-9a-f]{64})(_\d+)?\.\w+$')
+
+
+class StaticAssets:
+    def __init__(self, app=None):
+        self._fingerprints = {}  # path -> (mtime_ns, size, fingerprint)
+        self._compress_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_ACCEL_REDIRECT', None)
+        app.extensions['static_assets'] = self
+        app.url_defaults(self._add_fingerprint)
+        app.view_functions['static'] = self.send
+        app.cli.add_command(precompress_static_command)
+
+    def fingerprint(self, filename):
+        """Short content hash of a static file, or None if it does not exist"""
+        path = safe_join(current_app.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except (TypeError, OSError):
+            return None
+
+        cached = self._fingerprints.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.md5()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:12]
+        self._fingerprints[path] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+        return fingerprint
+
+    def _add_fingerprint(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            fingerprint = self.fingerprint(values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    def _is_fresh(self, sibling, source_stat):
+        try:
+            return os.stat(sibling).st_mtime_ns == source_stat.st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def compressed_sibling(self, path, encoding):
+        """Path of an up-to-date compressed copy of `path`, building it if needed.
+
+        Raises OSError when the sibling cannot be written, e.g. on a read-only
+        static folder.
+        """
+        suffix, compress = ENCODINGS[encoding]
+        sibling = path + suffix
+        source_stat = os.stat(path)
+        if self._is_fresh(sibling, source_stat):
+            return sibling
+
+        with self._compress_lock:
+            # Another thread may have built it while this one waited
+            if self._is_fresh(sibling, source_stat):
+                return sibling
+            with open(path, 'rb') as source:
+                data = compress(source.read())
+            # Write then rename so concurrent readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.precompress-')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    output.write(data)
+                # The sibling carries the source mtime; any edit to the source makes it stale
+                os.utime(temp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+                os.replace(temp_path, sibling)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return sibling
+
+    def precompress(self, static_folder):
+        """Build every compressed sibling under the static folder; returns the count"""
+        built = 0
+        for root, _, files in os.walk(static_folder):
+            for name in files:
+                path = os.path.join(root, name)
+                if self._is_compressible(path):
+                    for encoding in ENCODINGS:
+                        self.compressed_sibling(path, encoding)
+                        built += 1
+        return built
+
+    def _is_compressible(self, path):
+        return (os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+                and os.path.getsize(path) >= MIN_COMPRESS_SIZE)
+
+    def _negotiate_encoding(self, path):
+        if not os.path.isfile(path) or not self._is_compressible(path):
+            return None
+        for encoding in ENCODINGS:
+            if request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def is_immutable(self, filename):
+        if filename.startswith('assets/') and IMMUTABLE_ASSET.match(os.path.basename(filename)):
+            return True
+        version = request.args.get('v')
+        return bool(version) and version == self.fingerprint(filename)
+
+    def send(self, filename):
+        """Serve a file from the static folder with production cache headers"""
+        static_folder = current_app.static_folder
+        accel_prefix = current_app.config['STATIC_ACCEL_REDIRECT']
+
+        if accel_prefix:
+            path = safe_join(static_folder, filename)
+            if path is None or not os.path.isfile(path):
+                raise NotFound()
+            response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+        else:
+            path = safe_join(static_folder, filename)
+            encoding = self._negotiate_encoding(path) if path else None
+            sibling = None
+            if encoding:
+                try:
+                    sibling = self.compressed_sibling(path, encoding)
+                except OSError as error:
+                    # Serve the file as is rather than fail the request
+                    current_app.logger.warning('Could not build %s copy of %s: %s', encoding, filename, error)
+            if sibling:
+                response = send_from_directory(static_folder, os.path.relpath(sibling, static_folder),
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.content_encoding = encoding
+            else:
+                response = send_from_directory(static_folder, filename)
+            if path and os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                response.vary.add('Accept-Encoding')
+
+        response.cache_control.public = True
+        if self.is_immutable(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = 0
+            response.cache_control.no_cache = True
+        return response
+
+
+static_assets = StaticAssets()
+
+
+@click.command('precompress-static')
+def precompress_static_command():
+    """Build .br/.gz siblings for every compressible static file."""
+    built = static_assets.precompress(current_app.static_folder)
+    click.echo(f'Built {built} compressed static files')
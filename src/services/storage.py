@@ -0,0 +1,277 @@
+"""
+Storage for originals and renditions.
+
+Backends are chosen with STORAGE_URL:
+
+- unset (default) - the local UPLOAD_FOLDER, served through the static path
+- ``s3://bucket/prefix`` - any S3-compatible object store (AWS, MinIO, R2,
+  moto). Add ``?endpoint_url=http://minio:9000`` for a non-AWS endpoint;
+  credentials come from the usual AWS environment variables. Uploads stream
+  through boto3's multipart transfer and reads redirect to a presigned URL,
+  or to STORAGE_PUBLIC_URL when a CDN fronts the bucket, so image bytes never
+  pass through a Flask worker. Several web instances can share one bucket.
+
+Image processing needs real files, so it runs in a *workspace*: the upload
+folder itself for local storage, a temporary directory for object storage.
+``localize`` brings an original into the workspace and ``publish`` stores
+what processing wrote there.
+
+Pages and bookmarks from before storage backends link uploads as
+``/static/assets/<key>``; those URLs are served from storage too. Moving to
+object storage is ``flask copy-storage`` with the new STORAGE_URL set, which
+copies everything under UPLOAD_FOLDER into the bucket.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import click
+from contextlib import contextmanager, nullcontext
+from urllib.parse import parse_qs, urlparse
+from flask import current_app, redirect, send_from_directory
+from src.services.ingest import CHUNK_SIZE, store_atomically
+from src.services.static_assets import static_assets
+
+# Static path prefix uploads were served under before storage backends
+ASSET_PREFIX = 'assets/'
+
+
+class LocalStorage:
+    """Files under a local folder; inside the static folder they get static serving"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def save(self, key, fileobj):
+        """Stream a file object to `key`"""
+        def write(output):
+            if isinstance(fileobj, io.BytesIO):
+                output.write(fileobj.getbuffer())
+            else:
+                shutil.copyfileobj(fileobj, output, CHUNK_SIZE)
+        store_atomically(self.path(key), write)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def list(self):
+        for folder, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), stat.st_size, int(stat.st_mtime)
+
+    def staging_root(self):
+        # Staging on the same filesystem lets import_file move instead of copy
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def import_file(self, key, path):
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        os.replace(path, self.path(key))
+
+    def workspace(self):
+        return nullcontext(self.root)
+
+    def localize(self, key, folder):
+        return self.path(key)
+
+    def publish(self, folder, keys):
+        pass
+
+    def send(self, key):
+        static_folder = current_app.static_folder
+        path = self.path(key)
+        if os.path.commonpath([static_folder, os.path.abspath(path)]) == static_folder:
+            return static_assets.send(os.path.relpath(path, static_folder).replace(os.sep, '/'))
+        return send_from_directory(self.root, key)
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket, served by redirect"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, public_url=None, presign_ttl=3600):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError('STORAGE_URL uses s3:// but the boto3 package is not installed')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.transfer_config = TransferConfig(multipart_threshold=8 * 1024 * 1024,
+                                              multipart_chunksize=8 * 1024 * 1024)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.presign_ttl = presign_ttl
+
+    def _key(self, key):
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def save(self, key, fileobj):
+        """Stream a file object to `key`, in parallel multipart chunks when large"""
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key), Config=self.transfer_config)
+
+    def open(self, key):
+        """Download an object into a temporary file, spilling to disk when large"""
+        fileobj = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        self.client.download_fileobj(self.bucket, self._key(key), fileobj, Config=self.transfer_config)
+        fileobj.seek(0)
+        return fileobj
+
+    def list(self):
+        prefix = f'{self.prefix}/' if self.prefix else ''
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(prefix):]
+                if not os.path.basename(key).startswith('.'):
+                    yield key, obj['Size'], int(obj['LastModified'].timestamp())
+
+    def staging_root(self):
+        return None
+
+    def import_file(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer_config)
+
+    @contextmanager
+    def workspace(self):
+        with tempfile.TemporaryDirectory(prefix='minds-eye-') as folder:
+            yield folder
+
+    def localize(self, key, folder):
+        path = os.path.join(folder, key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.client.download_file(self.bucket, self._key(key), path, Config=self.transfer_config)
+        return path
+
+    def publish(self, folder, keys):
+        for key in keys:
+            self.client.upload_file(os.path.join(folder, key), self.bucket, self._key(key),
+                                    Config=self.transfer_config)
+
+    def send(self, key):
+        if self.public_url:
+            return redirect(f'{self.public_url}/{self._key(key)}')
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(key)}, ExpiresIn=self.presign_ttl
+        )
+        response = redirect(url)
+        # Browsers may reuse the redirect, but never past the signature's expiry
+        response.cache_control.private = True
+        response.cache_control.max_age = self.presign_ttl // 2
+        return response
+
+
+def storage_from_url(url, config):
+    if not url:
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return LocalStorage(parsed.path)
+    if parsed.scheme == 's3':
+        options = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+        return S3Storage(parsed.netloc, parsed.path, endpoint_url=options.get('endpoint_url'),
+                         region=options.get('region'), public_url=config['STORAGE_PUBLIC_URL'],
+                         presign_ttl=config['STORAGE_PRESIGN_TTL'])
+    raise ValueError(f'Unsupported STORAGE_URL: {url}')
+
+
+class Storage:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STORAGE_URL', None)
+        app.config.setdefault('STORAGE_PUBLIC_URL', None)
+        app.config.setdefault('STORAGE_PRESIGN_TTL', 3600)
+        self.backend = storage_from_url(app.config['STORAGE_URL'], app.config)
+        app.extensions['storage'] = self
+        app.cli.add_command(copy_storage_command)
+
+        # Wrap the static view (after static_assets has replaced it) so /static/assets/ reads from storage
+        static_view = app.view_functions['static']
+
+        def send_static(filename):
+            if filename.startswith(ASSET_PREFIX):
+                return self.send(filename[len(ASSET_PREFIX):])
+            return static_view(filename)
+        app.view_functions['static'] = send_static
+
+    def exists(self, key):
+        return self.backend.exists(key)
+
+    def save(self, key, fileobj):
+        self.backend.save(key, fileobj)
+
+    def open(self, key):
+        return self.backend.open(key)
+
+    def list(self):
+        """Yield (key, size, mtime) for every stored file"""
+        return self.backend.list()
+
+    def staging_root(self):
+        """Local folder to stage incoming files in, or None for the system temp folder"""
+        return self.backend.staging_root()
+
+    def import_file(self, key, path):
+        """Move a complete local file into storage under `key`"""
+        self.backend.import_file(key, path)
+
+    def workspace(self):
+        """Context manager yielding a local folder to process images in"""
+        return self.backend.workspace()
+
+    def localize(self, key, folder):
+        """Local path of `key` inside a workspace, downloading it if needed"""
+        return self.backend.localize(key, folder)
+
+    def publish(self, folder, keys):
+        """Store files that processing wrote into a workspace"""
+        self.backend.publish(folder, keys)
+
+    def send(self, key):
+        """Response delivering `key` to the client"""
+        return self.backend.send(key)
+
+
+storage = Storage()
+
+
+@click.command('copy-storage')
+@click.option('--source', help='STORAGE_URL to copy from (default: the local UPLOAD_FOLDER).')
+def copy_storage_command(source):
+    """Copy stored originals and renditions into the configured storage, e.g. local files to S3."""
+    source_backend = storage_from_url(source, current_app.config)
+    copied = skipped = 0
+    for key, size, mtime in source_backend.list():
+        if storage.exists(key):
+            skipped += 1
+            continue
+        with source_backend.open(key) as fileobj:
+            storage.save(key, fileobj)
+        copied += 1
+        click.echo(f'{key}: {size} bytes')
+    click.echo(f"Copied {copied} files{f', {skipped} already stored' if skipped else ''}")
@@ -0,0 +1,64 @@
+"""
+Compiled template registry.
+
+Jinja keeps every template it has loaded in an in-memory cache, compiled,
+and (outside debug mode) does not re-check the source file on each render.
+``warm()`` loads every page template once, so the first visitor to each page
+does not pay the compile cost; the bootstrap calls it on a worker's first
+request.
+
+Set TEMPLATE_BYTECODE_CACHE to a folder to also keep compiled bytecode on
+disk with Jinja's ``FileSystemBytecodeCache``. Workers and restarts then load
+templates without parsing them; ``flask compile-templates`` fills the cache
+ahead of time, e.g. as a build step.
+"""
+
+import os
+import time
+import click
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+
+TEMPLATE_EXTENSIONS = ('.html',)
+
+
+class TemplateRegistry:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TEMPLATE_BYTECODE_CACHE', None)
+        self.app = app
+        app.extensions['templates'] = self
+        folder = app.config['TEMPLATE_BYTECODE_CACHE']
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(folder)
+        app.cli.add_command(compile_templates_command)
+
+    def names(self):
+        """Every page template the app's loaders can find"""
+        return self.app.jinja_env.list_templates(filter_func=lambda name: name.endswith(TEMPLATE_EXTENSIONS))
+
+    def warm(self):
+        """Compile every template into Jinja's cache; returns how many were loaded"""
+        names = self.names()
+        for name in names:
+            self.app.jinja_env.get_template(name)
+        return len(names)
+
+
+@click.command('compile-templates')
+def compile_templates_command():
+    """Compile every template, filling TEMPLATE_BYTECODE_CACHE when set."""
+    started = time.perf_counter()
+    count = templates.warm()
+    elapsed = (time.perf_counter() - started) * 1000
+    folder = current_app.config['TEMPLATE_BYTECODE_CACHE']
+    click.echo(f"Compiled {count} templates in {elapsed:.0f} ms"
+               f"{f' into {folder}' if folder else ' (no TEMPLATE_BYTECODE_CACHE set, nothing persisted)'}")
+
+
+templates = TemplateRegistry()
@@ -3,6 +3,7 @@
 class PortfolioManager {
     constructor() {
         this.currentImages = [];
+        this.nextCursor = null;
         this.currentImageIndex = 0;
         this.isLightboxOpen = false;
         
@@ -12,14 +13,16 @@ class PortfolioManager {
     init() {
         this.setupEventListeners();
         this.loadPortfolioData();
+        this.loadFacets(new URLSearchParams(window.location.search).get('category') || 'all');
         this.setupImageLoading();
     }
     
     setupEventListeners() {
         // Category filter buttons
         document.querySelectorAll('.filter-btn').forEach(btn => {
-            btn.addEventListener('click', (e) => {
-                this.handleCategoryFilter(e.target.dataset.category);
+            btn.addEventListener('click', () => {
+                // The button, not the click target, which may be its count badge
+                this.handleCategoryFilter(btn.dataset.category);
             });
         });
         
@@ -84,15 +87,83 @@ class PortfolioManager {
     }
     
     async loadPortfolioData() {
+        // Only the first page is fetched up front; later pages load on demand
+        this.currentImages = [];
+        this.nextCursor = null;
+        await this.loadNextPage();
+    }
+    
+    async loadNextPage() {
         try {
-            const response = await fetch('/api/portfolio');
-            this.currentImages = await response.json();
-            this.updateImageCount();
+            const params = new URLSearchParams({
+                fields: 'id,title,description,filename,image_url,display_url,category_names,created_at'
+            });
+            if (this.nextCursor) {
+                params.set('cursor', this.nextCursor);
+            }
+            
+            const response = await fetch(`/api/portfolio?${params}`);
+            const data = await response.json();
+            this.currentImages.push(...data.images);
+            this.nextCursor = data.next_cursor;
+            return data.images.length > 0;
         } catch (error) {
             console.error('Error loading portfolio data:', error);
+            return false;
+        }
+    }
+    
+    async loadFacets(category = 'all') {
+        // Counts come from the server's facets, so the full catalogue is never needed
+        try {
+            const params = new URLSearchParams({ limit: 1, fields: 'id' });
+            if (category !== 'all') {
+                params.set('category', category);
+            }
+            
+            const response = await fetch(`/api/portfolio/search?${params}`);
+            const data = await response.json();
+            if (category === 'all') {
+                this.totalCount = data.total;
+            }
+            this.renderCategoryCounts(data.facets.category);
+            
+            const imageCountElement = document.getElementById('image-count');
+            if (imageCountElement) {
+                imageCountElement.textContent = data.total;
+            }
+        } catch (error) {
+            console.error('Error loading portfolio facets:', error);
         }
     }
     
+    renderCategoryCounts(categoryFacet) {
+        // The category facet ignores the selected category, so every button keeps its count
+        const counts = Object.fromEntries(categoryFacet.map(facet => [facet.value, facet.count]));
+        document.querySelectorAll('.filter-btn').forEach(btn => {
+            const category = btn.dataset.category;
+            const count = category === 'all' ? this.totalCount : (counts[category] || 0);
+            if (count === undefined) return;
+            
+            let badge = btn.querySelector('.filter-count');
+            if (!badge) {
+                badge = document.createElement('span');
+                badge.className = 'filter-count';
+                btn.appendChild(badge);
+            }
+            badge.textContent = ` (${count})`;
+        });
+    }
+    
+    async findImage(imageId) {
+        // Page forward until the requested image has been loaded
+        let index = this.currentImages.findIndex(img => img.id == imageId);
+        while (index === -1 && this.nextCursor && await this.loadNextPage()) {
+            index = this.currentImages.findIndex(img => img.id == imageId);
+        }
+        return index;
+    }
+    
     handleCategoryFilter(category) {
         // Update active filter button
         document.querySelectorAll('.filter-btn').forEach(btn => {
@@ -150,33 +221,19 @@ class PortfolioManager {
             }
         });
         
-        // Update stats
-        const imageCountElement = document.getElementById('image-count');
-        if (imageCountElement) {
-            imageCountElement.textContent = visibleCount;
-        }
+        return visibleCount;
     }
     
-    updateImageCount(category = null) {
-        let count = this.currentImages.length;
-        
-        if (category && category !== 'all') {
-            count = this.currentImages.filter(img => 
-                img.categories.includes(category)
-            ).length;
-        }
-        
-        const imageCountElement = document.getElementById('image-count');
-        if (imageCountElement) {
-            imageCountElement.textContent = count;
-        }
+    updateImageCount(category = 'all') {
+        return this.loadFacets(category || 'all');
     }
     
     async openLightbox(imageId) {
-        const image = this.currentImages.find(img => img.id == imageId);
-        if (!image) return;
+        const index = await this.findImage(imageId);
+        if (index === -1) return;
         
-        this.currentImageIndex = this.currentImages.findIndex(img => img.id == imageId);
+        const image = this.currentImages[index];
+        this.currentImageIndex = index;
         this.isLightboxOpen = true;
         
         // Populate lightbox content
@@ -200,7 +257,7 @@ class PortfolioManager {
         const lightboxCategories = document.getElementById('lightbox-categories');
         
         if (lightboxImage) {
-            lightboxImage.src = image.url;
+            lightboxImage.src = image.display_url || image.image_url;
             lightboxImage.alt = image.title;
         }
         
@@ -214,7 +271,7 @@ class PortfolioManager {
         }
         
         if (lightboxCategories) {
-            lightboxCategories.innerHTML = image.categories.map(cat => 
+            lightboxCategories.innerHTML = image.category_names.map(cat => 
                 `<span class="category-tag" data-category="${cat}">${cat}</span>`
             ).join('');
             
@@ -340,7 +397,11 @@ class PortfolioManager {
         }
     }
     
-    nextImage() {
+    async nextImage() {
+        if (this.currentImageIndex === this.currentImages.length - 1 && this.nextCursor) {
+            await this.loadNextPage();
+        }
+        
         if (this.currentImageIndex < this.currentImages.length - 1) {
             this.currentImageIndex++;
             const image = this.currentImages[this.currentImageIndex];
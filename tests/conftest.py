@@ -0,0 +1,72 @@
+import io
+import time
+import pytest
+from PIL import Image, TiffImagePlugin
+from src.models.user import db
+
+
+def create_test_app(tmp_path, monkeypatch, database):
+    """An app on the SQLite file `database` with uploads under tmp_path, not yet bootstrapped"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database}')
+    monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path / 'assets'))
+    monkeypatch.setenv('CACHE_URL', 'memory://')
+    monkeypatch.setenv('BATCH_WORKERS', '2')
+    monkeypatch.delenv('STORAGE_URL', raising=False)
+    monkeypatch.delenv('AUTO_MIGRATE', raising=False)
+    from src.main import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def dispose(app):
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """A bootstrapped app on a fresh SQLite database with uploads under tmp_path"""
+    app = create_test_app(tmp_path, monkeypatch, tmp_path / 'app.db')
+    from src.services.startup import bootstrap
+    with app.app_context():
+        bootstrap.ensure()
+    yield app
+    dispose(app)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_jpeg(color='red', size=(64, 48), exif=None, image=None, quality=90):
+    """JPEG bytes of a flat colour (or of `image`), with optional Exif sub-IFD tags {tag: value}"""
+    image = image or Image.new('RGB', size, color)
+    options = {'quality': quality}
+    if exif:
+        tags = image.getexif()
+        tags[0x8769] = {tag: TiffImagePlugin.IFDRational(*value) if isinstance(value, tuple) else value
+                        for tag, value in exif.items()}
+        options['exif'] = tags
+    output = io.BytesIO()
+    image.save(output, 'JPEG', **options)
+    output.seek(0)
+    return output
+
+
+def photo(seed, size=(128, 96)):
+    """A textured test image; different seeds give unrelated images"""
+    image = Image.effect_mandelbrot(size, (-2 + seed * 0.37, -1.2, 1 + seed * 0.21, 1.2), 100 + seed * 7)
+    return image.convert('RGB')
+
+
+def wait_for_job(client, status_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()['job']
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'{status_url} did not finish')
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+from conftest import make_jpeg, wait_for_job
+from src.services.backup import DATABASE_NAME, MANIFEST_NAME, TarStream
+
+BASELINE_DB = os.path.join(os.path.dirname(__file__), '..', 'src', 'database', 'app.db')
+
+
+def upload(client, title, color):
+    response = client.post('/api/admin/upload', data={'image': (make_jpeg(color), f'{title}.jpg'), 'title': title},
+                           content_type='multipart/form-data').get_json()
+    wait_for_job(client, response['status_url'])
+
+
+def backup(client, mode='full'):
+    response = client.get(f'/api/admin/backup?mode={mode}')
+    assert response.status_code == 200
+    return response.data
+
+
+def restore(client, archive):
+    return client.post('/api/admin/restore', data=archive, content_type='application/gzip')
+
+
+def members(archive):
+    with tarfile.open(fileobj=io.BytesIO(archive), mode='r:gz') as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar if member.isfile()}
+
+
+def pack(files):
+    """A gzip tar archive of {name: bytes}"""
+    stream = TarStream('gzip')
+    chunks = []
+    for name, data in files.items():
+        chunks.extend(stream.add(name, io.BytesIO(data), len(data), 0))
+    chunks.extend(stream.close())
+    return b''.join(chunks)
+
+
+def portfolio_titles(client):
+    return [image['title'] for image in client.get('/api/portfolio?fields=title').get_json()['images']]
+
+
+def test_full_backup_and_restore(app, client):
+    upload(client, 'one', 'red')
+    archive = backup(client)
+    upload(client, 'two', 'blue')
+    shutil.rmtree(app.config['UPLOAD_FOLDER'])
+
+    response = restore(client, archive)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['mode'] == 'full'
+    assert portfolio_titles(client) == ['one']
+    manifest = json.loads(members(archive)[MANIFEST_NAME])
+    for key in manifest['assets']:
+        assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], key))
+
+
+def test_restore_never_reuses_content_versions(app, client):
+    upload(client, 'one', 'red')
+    archive = backup(client)
+    upload(client, 'two', 'blue')
+    before = client.get('/api/portfolio?fields=title')
+    assert restore(client, archive).status_code == 200
+    upload(client, 'three', 'green')
+
+    after = client.get('/api/portfolio?fields=title')
+    assert [image['title'] for image in after.get_json()['images']] == ['three', 'one']
+    assert after.headers['ETag'] != before.headers['ETag']
+    revalidated = client.get('/api/portfolio?fields=title', headers={'If-None-Match': before.headers['ETag']})
+    assert revalidated.status_code == 200
+
+
+def test_incremental_after_full(app, client):
+    upload(client, 'one', 'red')
+    full = backup(client)
+    upload(client, 'two', 'blue')
+    incremental = backup(client, 'incremental')
+
+    full_assets = {name for name in members(full) if name.startswith('assets/')}
+    incremental_assets = {name for name in members(incremental) if name.startswith('assets/')}
+    assert incremental_assets and not incremental_assets & full_assets
+    manifest = json.loads(members(incremental)[MANIFEST_NAME])
+    assert manifest['mode'] == 'incremental'
+    assert set(manifest['assets']) == {name[len('assets/'):] for name in full_assets | incremental_assets}
+
+    shutil.rmtree(app.config['UPLOAD_FOLDER'])
+    assert restore(client, full).status_code == 200
+    response = restore(client, incremental)
+    assert response.status_code == 200
+    assert response.get_json()['missing_from_earlier_backups'] == []
+    assert sorted(portfolio_titles(client)) == ['one', 'two']
+
+
+def test_checksum_mismatch_is_rejected(app, client):
+    upload(client, 'one', 'red')
+    files = members(backup(client))
+    upload(client, 'two', 'blue')
+    asset = next(name for name in files if name.startswith('assets/'))
+    files[asset] = files[asset][:-1] + b'\0'
+
+    response = restore(client, pack(files))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'Checksum mismatch for {asset}'
+    assert sorted(portfolio_titles(client)) == ['one', 'two']
+
+
+def test_truncated_archive_is_rejected(app, client):
+    upload(client, 'one', 'red')
+    archive = backup(client)
+    upload(client, 'two', 'blue')
+
+    response = restore(client, archive[:len(archive) // 2])
+    assert response.status_code == 400
+    assert 'truncated' in response.get_json()['error'] or 'no manifest' in response.get_json()['error']
+    assert sorted(portfolio_titles(client)) == ['one', 'two']
+
+
+def test_older_snapshots_are_migrated(app, client):
+    with open(BASELINE_DB, 'rb') as snapshot:
+        database = snapshot.read()
+    manifest = {'format': 1, 'name': 'before-migrations', 'mode': 'full', 'base': None, 'created_at': None,
+                'database': {'size': len(database), 'sha256': hashlib.sha256(database).hexdigest()}, 'assets': {}}
+    archive = pack({DATABASE_NAME: database, MANIFEST_NAME: json.dumps(manifest).encode()})
+
+    response = restore(client, archive)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['migrations_applied']
+    assert client.get('/api/portfolio').status_code == 200
+    upload(client, 'after restore', 'red')
+    assert portfolio_titles(client) == ['after restore']
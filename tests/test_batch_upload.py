@@ -0,0 +1,64 @@
+import io
+import zipfile
+from conftest import make_jpeg, photo
+from src.services import batch
+
+
+def zip_of(members):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    output.seek(0)
+    return output
+
+
+def test_only_batch_upload_accepts_large_bodies(app, client):
+    app.config['MAX_CONTENT_LENGTH'] = 4 * 1024
+    padding = io.BytesIO(b'x' * 8 * 1024)
+
+    single = client.post('/api/admin/upload', data={'image': (padding, 'big.jpg')},
+                         content_type='multipart/form-data')
+    assert single.status_code == 413
+
+    files = [(make_jpeg('red', size=(32, 32)), 'a.jpg'), (make_jpeg('blue', size=(32, 32)), 'b.jpg'),
+             (io.BytesIO(b'x' * 6 * 1024), 'padding.txt')]
+    response = client.post('/api/admin/upload/batch', data={'images': files}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+
+
+def test_batch_images_are_limited_to_the_single_upload_size(app, client):
+    app.config['MAX_CONTENT_LENGTH'] = 4 * 1024
+    large = make_jpeg(image=photo(1, (320, 240)), quality=95)
+    assert len(large.getvalue()) > 4 * 1024
+    files = [(make_jpeg('red', size=(32, 32)), 'small.jpg'), (large, 'large.jpg')]
+
+    response = client.post('/api/admin/upload/batch', data={'images': files}, content_type='multipart/form-data')
+    results = response.get_json()['results']
+    assert [item['status'] for item in results] == ['created', 'failed']
+    assert results[1] == {'file': 'large.jpg', 'status': 'failed', 'error': 'File too large'}
+
+
+def test_zip_expansion_is_bounded(app, client):
+    app.config['BATCH_MAX_CONTENT_LENGTH'] = 64 * 1024
+    # Compresses to almost nothing but expands past the batch limit
+    bomb = zip_of([('a.jpg', make_jpeg('red').getvalue()), ('b.jpg', b'\0' * 100 * 1024),
+                   ('c.jpg', make_jpeg('blue').getvalue())])
+
+    response = client.post('/api/admin/upload/batch', data={'images': [(bomb, 'shoot.zip')]},
+                           content_type='multipart/form-data')
+    results = response.get_json()['results']
+    assert [item['status'] for item in results] == ['created', 'failed']
+    assert results[1] == {'file': 'shoot.zip', 'status': 'failed',
+                          'error': 'Archives expand beyond the batch size limit'}
+
+
+def test_batches_share_one_process_pool(app, client):
+    pools = []
+    for color in ('red', 'green'):
+        response = client.post('/api/admin/upload/batch', data={'images': [(make_jpeg(color), f'{color}.jpg')]},
+                               content_type='multipart/form-data')
+        assert response.get_json()['created'] == 1
+        pools.append(batch.process_pool(app.config['BATCH_WORKERS']))
+    assert pools[0] is pools[1]
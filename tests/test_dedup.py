@@ -0,0 +1,97 @@
+import io
+import os
+from conftest import make_jpeg, wait_for_job
+from src.models.user import db, PortfolioImage
+from src.services import processing
+from src.services.ingest import file_sha256
+
+
+def upload(client, image, name='photo.jpg'):
+    return client.post('/api/admin/upload', data={'image': (io.BytesIO(image), name)},
+                       content_type='multipart/form-data')
+
+
+def failed_upload(client, monkeypatch, image):
+    """Upload `image` with processing broken, leaving a failed row"""
+    def broken(filename):
+        raise OSError('disk full')
+    monkeypatch.setattr(processing, 'process_stored', broken)
+    response = upload(client, image)
+    assert wait_for_job(client, response.get_json()['status_url'])['status'] == 'failed'
+    monkeypatch.undo()
+    return response.get_json()['image']['id']
+
+
+def image_row(app, image_id):
+    with app.app_context():
+        return db.session.get(PortfolioImage, image_id).to_dict(['id', 'status', 'is_active', 'renditions'])
+
+
+def test_reupload_links_to_the_stored_image(app, client):
+    image = make_jpeg('green').getvalue()
+    first = upload(client, image)
+    wait_for_job(client, first.get_json()['status_url'])
+    second = upload(client, image)
+    assert second.status_code == 200
+    assert second.get_json()['duplicate']
+    assert second.get_json()['image']['id'] == first.get_json()['image']['id']
+
+
+def test_reupload_of_a_hidden_image_shows_it(app, client):
+    image = make_jpeg('green').getvalue()
+    image_id = upload(client, image).get_json()['image']['id']
+    with app.app_context():
+        db.session.get(PortfolioImage, image_id).is_active = False
+        db.session.commit()
+    assert upload(client, image).get_json()['image']['is_active']
+    assert image_row(app, image_id)['is_active']
+
+
+def test_reupload_retries_a_failed_image(app, client, monkeypatch):
+    image = make_jpeg('green').getvalue()
+    image_id = failed_upload(client, monkeypatch, image)
+    response = upload(client, image)
+    assert response.status_code == 202
+    assert response.get_json()['image']['id'] == image_id
+    assert wait_for_job(client, response.get_json()['status_url'])['status'] == 'done'
+    row = image_row(app, image_id)
+    assert row['status'] == 'ready' and row['renditions']
+
+
+def test_batch_upload_retries_a_failed_image(app, client, monkeypatch):
+    image = make_jpeg('green').getvalue()
+    image_id = failed_upload(client, monkeypatch, image)
+    response = client.post('/api/admin/upload/batch', data={'images': [(io.BytesIO(image), 'again.jpg')]},
+                           content_type='multipart/form-data')
+    assert response.get_json()['results'][0]['image']['id'] == image_id
+    assert image_row(app, image_id)['status'] == 'ready'
+
+
+def test_reprocess_picks_up_failed_images(app, client, monkeypatch):
+    image_id = failed_upload(client, monkeypatch, make_jpeg('green').getvalue())
+    with app.app_context():
+        result = app.test_cli_runner().invoke(processing.reprocess_images_command)
+    assert 'Reprocessed 1 images' in result.output
+    assert image_row(app, image_id)['status'] == 'ready'
+
+
+def test_backfill_content_hashes(app, tmp_path):
+    originals = {'a.jpg': make_jpeg('red'), 'b.jpg': make_jpeg('blue'), 'copy-of-a.jpg': make_jpeg('red')}
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with app.app_context():
+        for filename, image in originals.items():
+            with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'wb') as output:
+                output.write(image.getvalue())
+            db.session.add(PortfolioImage(filename=filename, original_filename=filename))
+        db.session.add(PortfolioImage(filename='missing.jpg', original_filename='missing.jpg'))
+        db.session.commit()
+
+    with app.app_context():
+        result = app.test_cli_runner().invoke(processing.backfill_content_hashes_command, ['--batch-size', '2'])
+    assert 'Hashed 3 originals, 1 unreadable' in result.output
+    with app.app_context():
+        hashes = dict(db.session.query(PortfolioImage.filename, PortfolioImage.content_hash))
+    assert hashes['a.jpg'] == file_sha256(os.path.join(app.config['UPLOAD_FOLDER'], 'a.jpg'))
+    assert hashes['b.jpg'] and hashes['b.jpg'] != hashes['a.jpg']
+    # The unique index allows one row per content; the copy keeps a NULL hash
+    assert hashes['copy-of-a.jpg'] is None and hashes['missing.jpg'] is None
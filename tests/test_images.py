@@ -0,0 +1,65 @@
+import io
+import os
+from PIL import Image
+from conftest import make_jpeg, photo, wait_for_job
+from src.services.derivatives import derivative_cache
+
+
+def upload_photo(client):
+    response = client.post('/api/admin/upload', data={'image': (make_jpeg(image=photo(1, (640, 480))), 'lake.jpg')},
+                           content_type='multipart/form-data').get_json()
+    wait_for_job(client, response['status_url'])
+    return response['image']['id']
+
+
+def cached_files():
+    with os.scandir(derivative_cache.folder) as entries:
+        return {entry.name: entry.stat().st_size for entry in entries if entry.is_file()}
+
+
+def test_derivative_is_rendered_then_served_from_the_cache(app, client):
+    image_id = upload_photo(client)
+    response = client.get(f'/img/{image_id}/100x0.webp')
+    assert response.status_code == 200
+    assert response.cache_control.max_age > 0 and response.cache_control.immutable
+    assert not response.cache_control.no_cache
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert (image.format, image.size) == ('WEBP', (100, 75))
+
+    (name,) = cached_files()
+    mtime = os.stat(os.path.join(derivative_cache.folder, name)).st_mtime_ns
+    again = client.get(f'/img/{image_id}/100x0.webp')
+    assert again.data == response.data
+    assert os.stat(os.path.join(derivative_cache.folder, name)).st_mtime_ns == mtime
+
+
+def test_derivative_errors(app, client):
+    image_id = upload_photo(client)
+    assert client.get('/img/999/100x0.webp').status_code == 404
+    assert client.get(f'/img/{image_id}/100x0.bmp').status_code == 404
+    assert client.get(f'/img/{image_id}/0x0.webp').status_code == 400
+    assert client.get(f'/img/{image_id}/99999x0.webp').status_code == 400
+
+
+def test_derivatives_are_evicted_below_the_limit(app, client):
+    image_id = upload_photo(client)
+    client.get(f'/img/{image_id}/200x0.jpg')
+    first_size = sum(cached_files().values())
+    app.config['DERIVATIVE_CACHE_MAX_BYTES'] = int(first_size * 2.5)
+
+    for width in (201, 202, 203, 204):
+        assert client.get(f'/img/{image_id}/{width}x0.jpg').status_code == 200
+    files = cached_files()
+    assert sum(files.values()) <= app.config['DERIVATIVE_CACHE_MAX_BYTES']
+    # The most recent render is kept
+    assert any(name.endswith('_204x0.jpg') for name in files)
+
+
+def test_negotiated_image_is_cached_for_a_day(app, client):
+    image_id = upload_photo(client)
+    response = client.get(f'/img/{image_id}/320', headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert response.headers['Vary'] == 'Accept'
+    assert response.cache_control.public and response.cache_control.max_age == 24 * 60 * 60
+    assert not response.cache_control.no_cache and not response.cache_control.immutable
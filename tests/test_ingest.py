@@ -0,0 +1,20 @@
+import threading
+from conftest import make_jpeg, wait_for_job
+from src.services import ingest
+
+
+def test_single_upload_parses_exif_in_the_job_only(app, client, monkeypatch):
+    threads = []
+    parse = ingest.extract_exif_data
+
+    def recording(image):
+        threads.append(threading.current_thread())
+        return parse(image)
+    monkeypatch.setattr(ingest, 'extract_exif_data', recording)
+
+    response = client.post('/api/admin/upload', data={'image': (make_jpeg(exif={0x8827: 800}), 'lake.jpg')},
+                           content_type='multipart/form-data')
+    assert threads == []
+    job = wait_for_job(client, response.get_json()['status_url'])
+    assert job['status'] == 'done'
+    assert threads and threading.main_thread() not in threads
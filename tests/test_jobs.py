@@ -0,0 +1,39 @@
+import logging
+import time
+from src.models.user import db, ProcessingJob
+from src.services.jobs import job_runner
+from src.services.processing import PROCESS_IMAGE
+
+
+def test_failed_handler_is_recorded_and_logged(app, caplog):
+    with app.app_context():
+        job = ProcessingJob(kind=PROCESS_IMAGE)
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    with caplog.at_level(logging.ERROR):
+        job_runner.submit(job_id).result(timeout=10)
+
+    with app.app_context():
+        job = db.session.get(ProcessingJob, job_id)
+        assert job.status == 'failed'
+        assert 'has no portfolio image' in job.error
+    assert f'Job {job_id} (process_image) failed' in caplog.text
+
+
+def test_runner_errors_are_logged(app, caplog, monkeypatch):
+    def locked(job_id):
+        raise RuntimeError('database is locked')
+    monkeypatch.setattr(job_runner, '_claim', locked)
+
+    with caplog.at_level(logging.ERROR):
+        future = job_runner.submit(12345)
+        assert isinstance(future.exception(timeout=10), RuntimeError)
+        # Done-callbacks run just after waiters are woken
+        deadline = time.monotonic() + 5
+        while 'crashed in the runner' not in caplog.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert 'Job 12345 crashed in the runner' in caplog.text
+    assert 'database is locked' in caplog.text
@@ -0,0 +1,52 @@
+import os
+from conftest import make_jpeg, wait_for_job
+from src.models.user import db, PortfolioImage
+
+# FNumber, ExposureTime, ISOSpeedRatings, FocalLength
+EXPOSURE = {0x829D: (28, 10), 0x829A: (1, 250), 0x8827: 400, 0x920A: (35, 1)}
+
+
+def test_metadata_of_an_upload(app, client):
+    upload = client.post('/api/admin/upload', data={'image': (make_jpeg(exif=EXPOSURE), 'lake.jpg')},
+                         content_type='multipart/form-data').get_json()
+    wait_for_job(client, upload['status_url'])
+
+    response = client.get(f"/api/portfolio/image/{upload['image']['id']}/metadata")
+    metadata = response.get_json()
+    assert metadata['settings'] == 'f/2.8 · 1/250s'
+    assert (metadata['iso'], metadata['focal_length']) == ('400', '35mm')
+    assert metadata['exif']['FNumber'] == 2.8 and metadata['exif']['ISOSpeedRatings'] == 400
+    assert response.cache_control.public and response.cache_control.max_age > 0
+
+    with app.app_context():
+        content_hash = db.session.get(PortfolioImage, upload['image']['id']).content_hash
+    assert response.headers['ETag'] == f'"{content_hash}"'
+    revalidated = client.get(f"/api/portfolio/image/{upload['image']['id']}/metadata",
+                             headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_metadata_is_parsed_on_first_request_for_older_images(app, client):
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'older.jpg'), 'wb') as original:
+        original.write(make_jpeg(exif=EXPOSURE).getvalue())
+    with app.app_context():
+        image = PortfolioImage(filename='older.jpg', original_filename='older.jpg', status='ready')
+        db.session.add(image)
+        db.session.commit()
+        image_id = image.id
+
+    metadata = client.get(f'/api/portfolio/image/{image_id}/metadata').get_json()
+    assert metadata['exif']['ExposureTime'] == 0.004
+    with app.app_context():
+        assert db.session.get(PortfolioImage, image_id).image_metadata is not None
+
+
+def test_metadata_of_missing_or_hidden_images(app, client):
+    with app.app_context():
+        image = PortfolioImage(filename='hidden.jpg', original_filename='hidden.jpg', is_active=False)
+        db.session.add(image)
+        db.session.commit()
+        image_id = image.id
+    assert client.get(f'/api/portfolio/image/{image_id}/metadata').status_code == 404
+    assert client.get('/api/portfolio/image/999/metadata').status_code == 404
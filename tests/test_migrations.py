@@ -0,0 +1,80 @@
+import os
+import shutil
+import sqlite3
+import pytest
+from conftest import create_test_app, dispose
+from src.models import migrations
+from src.models.user import db, Category, PortfolioImage
+from src.services.processing import hash_images_command
+
+BASELINE_DB = os.path.join(os.path.dirname(__file__), '..', 'src', 'database', 'app.db')
+
+
+@pytest.fixture
+def baseline_app(tmp_path, monkeypatch):
+    """An app on a copy of the database shipped before migrations existed, with one image in it"""
+    database = tmp_path / 'baseline.db'
+    shutil.copy(BASELINE_DB, database)
+    with sqlite3.connect(database) as connection:
+        connection.execute("INSERT INTO portfolio_image (filename, original_filename, title, is_active, sort_order, "
+                           "created_at) VALUES ('old.jpg', 'old.jpg', 'Before migrations', 1, 0, '2024-05-01 10:00:00')")
+    app = create_test_app(tmp_path, monkeypatch, database)
+    yield app
+    dispose(app)
+
+
+def test_baseline_database_migrates(baseline_app):
+    with baseline_app.app_context():
+        assert migrations.pending() == [version for version, _, _ in migrations.MIGRATIONS]
+        migrations.upgrade()
+        assert migrations.pending() == []
+        image = PortfolioImage.query.one()
+        assert (image.title, image.status, image.content_hash) == ('Before migrations', 'ready', None)
+        assert Category.query.count() == 5
+        # Search rows are kept in step with the table, including rows from before the index existed
+        assert db.session.execute(db.text("SELECT count(*) FROM portfolio_search")).scalar() == 1
+
+    response = baseline_app.test_client().get('/api/portfolio/search?q=migrations&fields=id')
+    assert [image['id'] for image in response.get_json()['images']] == [image.id]
+
+
+def test_upgrade_is_idempotent(baseline_app):
+    with baseline_app.app_context():
+        assert migrations.upgrade()
+        assert migrations.upgrade() == []
+
+
+def test_cli_commands_migrate_first(baseline_app):
+    with baseline_app.app_context():
+        result = baseline_app.test_cli_runner().invoke(hash_images_command)
+        assert result.exit_code == 0, result.output
+        assert 'Applied migrations 0, 1' in result.output
+        assert migrations.pending() == []
+
+
+def test_cli_commands_refuse_without_auto_migrate(baseline_app):
+    baseline_app.config['AUTO_MIGRATE'] = False
+    with baseline_app.app_context():
+        result = baseline_app.test_cli_runner().invoke(hash_images_command)
+        assert result.exit_code != 0
+        assert 'run `flask bootstrap` first' in result.output
+        assert migrations.pending()
+
+
+def status_default(app):
+    with app.app_context():
+        columns = db.inspect(db.engine).get_columns('portfolio_image')
+        return next(column['default'] for column in columns if column['name'] == 'status')
+
+
+def test_fresh_and_migrated_status_columns_match(app, baseline_app):
+    with baseline_app.app_context():
+        migrations.upgrade()
+    assert status_default(app) == status_default(baseline_app) == "'ready'"
+
+    # Rows written outside the ORM are visible on a fresh database too
+    with app.app_context():
+        db.session.execute(db.text("INSERT INTO portfolio_image (filename, original_filename, is_active, sort_order) "
+                                   "VALUES ('raw.jpg', 'raw.jpg', 1, 0)"))
+        db.session.commit()
+        assert PortfolioImage.query.filter_by(filename='raw.jpg').one().status == 'ready'
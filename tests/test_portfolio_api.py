@@ -0,0 +1,48 @@
+from sqlalchemy import text
+from src.models.user import db, Category, PortfolioImage
+
+
+def add_images(app, count, dated=True):
+    with app.app_context():
+        nature = Category.query.filter_by(name='Nature').one()
+        for index in range(count):
+            image = PortfolioImage(filename=f'{index}.jpg', original_filename=f'{index}.jpg', title=f'Image {index}')
+            image.categories.append(nature)
+            db.session.add(image)
+        db.session.commit()
+        if not dated:
+            # As if written outside the ORM, which never fills created_at
+            db.session.execute(text('UPDATE portfolio_image SET created_at = NULL WHERE id % 2 = 0'))
+            db.session.commit()
+
+
+def test_default_projection_keeps_the_original_keys(app, client):
+    add_images(app, 1)
+    image = client.get('/api/portfolio').get_json()['images'][0]
+    assert set(image) == set(PortfolioImage.LEGACY_FIELDS)
+    assert image['categories'][0]['name'] == 'Nature'
+
+
+def test_grid_projection(app, client):
+    add_images(app, 1)
+    image = client.get('/api/portfolio?fields=grid').get_json()['images'][0]
+    assert set(image) == set(PortfolioImage.GRID_FIELDS)
+    assert image['category_names'] == ['Nature']
+
+
+def test_pages_cover_undated_rows_once(app, client):
+    add_images(app, 7, dated=False)
+    seen, cursor = [], None
+    while True:
+        url = '/api/portfolio?fields=id&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        seen.extend(image['id'] for image in page['images'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(1, 8))
+    assert len(seen) == 7
+
+
+def test_invalid_cursor(client):
+    assert client.get('/api/portfolio?cursor=nonsense').status_code == 400
@@ -0,0 +1,51 @@
+from src.models.loading import assert_max_queries
+from src.models.user import db, Category, FeaturedImage, ImageRendition, PortfolioImage
+
+IMAGES = 12
+
+
+def add_gallery(app):
+    with app.app_context():
+        categories = Category.query.all()
+        for index in range(IMAGES):
+            image = PortfolioImage(filename=f'{index}.jpg', original_filename=f'{index}.jpg',
+                                   title=f'Image {index}', status='ready')
+            image.categories.extend(categories[:2])
+            for width in (480, 960):
+                image.renditions.append(ImageRendition(width=width, height=width * 3 // 4, format='webp',
+                                                       filename=f'{index}-{width}.webp'))
+            db.session.add(image)
+        db.session.flush()
+        db.session.add(FeaturedImage(portfolio_image_id=image.id, title='Featured', is_active=True))
+        db.session.commit()
+
+
+# Bounds are independent of the number of images: versions, the rows, then one SELECT per relationship
+
+def test_portfolio_query_count(app, client):
+    add_gallery(app)
+    with app.app_context():
+        with assert_max_queries(4):
+            response = client.get('/api/portfolio')
+    assert len(response.get_json()['images']) == IMAGES
+    with app.app_context():
+        with assert_max_queries(5):
+            response = client.get('/api/portfolio?fields=grid&category=Nature')
+    assert response.get_json()['images'][0]['srcset']
+
+
+def test_featured_query_count(app, client):
+    add_gallery(app)
+    with app.app_context():
+        with assert_max_queries(4):
+            response = client.get('/api/featured')
+    image = response.get_json()['featured']['portfolio_image']
+    assert image['categories'] and image['renditions']
+
+
+def test_admin_grid_query_count(app, client):
+    add_gallery(app)
+    with app.app_context():
+        with assert_max_queries(3):
+            response = client.get('/admin/portfolio')
+    assert response.status_code == 200
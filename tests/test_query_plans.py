@@ -0,0 +1,24 @@
+from src.models.user import db
+from src.services.query_plans import check_query_plans_command, plan_problems
+
+
+def test_full_scans_are_reported_in_both_plan_formats():
+    assert plan_problems(['SCAN portfolio_image'], False) == ['full scan of portfolio_image']
+    assert plan_problems(['SCAN TABLE portfolio_image'], False) == ['full scan of portfolio_image']
+    assert plan_problems(['SCAN TABLE portfolio_image AS p'], False) == ['full scan of portfolio_image']
+    assert plan_problems(['SEARCH portfolio_image USING INDEX ix_portfolio_image_gallery (is_active=?)'], False) == []
+    assert plan_problems(['SCAN TABLE portfolio_image USING INDEX ix_portfolio_image_gallery'], False) == []
+
+
+def test_temporary_sorts_are_reported_for_ordered_queries():
+    plan = ['SEARCH portfolio_image USING INDEX ix_portfolio_image_gallery (is_active=?)',
+            'USE TEMP B-TREE FOR ORDER BY']
+    assert plan_problems(plan, True) == ['sorts in a temporary b-tree']
+    assert plan_problems(plan, False) == []
+
+
+def test_hot_queries_are_indexed(app):
+    with app.app_context():
+        result = app.test_cli_runner().invoke(check_query_plans_command)
+        db.session.rollback()
+    assert result.exit_code == 0, result.output
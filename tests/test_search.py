@@ -0,0 +1,90 @@
+from src.models.user import db, Category, PortfolioImage
+from src.services import search
+
+
+def add_image(title, categories=(), **columns):
+    image = PortfolioImage(filename=f'{title}.jpg', original_filename=f'{title}.jpg', title=title, status='ready',
+                           **columns)
+    image.categories.extend(categories)
+    db.session.add(image)
+    return image
+
+
+def add_catalogue(app):
+    with app.app_context():
+        nature, street = Category.query.filter(Category.name.in_(('Nature', 'Street'))).order_by(Category.name)
+        add_image('Misty lake', [nature], camera_model='X-T5', lens='XF 16mm', iso='200')
+        add_image('Lake at dusk', [nature, street], camera_model='X-T5', lens='XF 56mm', iso='3200')
+        add_image('Market crowd', [street], camera_model='Q2', lens='Summilux 28', iso='3200')
+        add_image('Hidden lake', [nature], camera_model='Q2', is_active=False)
+        db.session.commit()
+
+
+def facet(response, name):
+    return {item['value']: item['count'] for item in response.get_json()['facets'][name]}
+
+
+def titles(response):
+    return sorted(image['title'] for image in response.get_json()['images'])
+
+
+def test_text_search_matches_word_prefixes(app, client):
+    add_catalogue(app)
+    response = client.get('/api/portfolio/search?q=lak&fields=title')
+    assert titles(response) == ['Lake at dusk', 'Misty lake']
+    assert response.get_json()['total'] == 2
+    assert titles(client.get('/api/portfolio/search?q=xf+56&fields=title')) == ['Lake at dusk']
+
+
+def test_facets_ignore_their_own_filter(app, client):
+    add_catalogue(app)
+    response = client.get('/api/portfolio/search?category=Street&camera=X-T5&fields=title')
+    assert titles(response) == ['Lake at dusk']
+    # Other categories are still counted for the chosen camera, other cameras for the chosen category
+    assert facet(response, 'category') == {'Nature': 2, 'Street': 1}
+    assert facet(response, 'camera') == {'Q2': 1, 'X-T5': 1}
+    assert facet(response, 'iso') == {'3200': 1}
+
+
+def test_facet_values_are_limited_except_categories(app, client, monkeypatch):
+    monkeypatch.setattr(search, 'FACET_LIMIT', 2)
+    with app.app_context():
+        categories = [Category(name=f'Series {index}', sort_order=10 + index) for index in range(4)]
+        db.session.add_all(categories)
+        for index, category in enumerate(categories):
+            add_image(f'Frame {index}', [category], camera_model=f'Body {index}')
+        db.session.commit()
+    response = client.get('/api/portfolio/search')
+    assert len(facet(response, 'camera')) == 2
+    assert facet(response, 'category') == {f'Series {index}': 1 for index in range(4)}
+
+
+def test_facets_can_be_skipped(app, client):
+    add_catalogue(app)
+    response = client.get('/api/portfolio/search?q=lake&facets=false').get_json()
+    assert 'facets' not in response and len(response['images']) == 2
+
+
+def add_exposures(app):
+    with app.app_context():
+        add_image('Night street', f_number=1.4, exposure_seconds=1 / 30, iso_speed=6400, focal_length_mm=35)
+        add_image('Noon dunes', f_number=8.0, exposure_seconds=1 / 1000, iso_speed=100, focal_length_mm=24)
+        add_image('Portrait', f_number=2.8, exposure_seconds=1 / 250, iso_speed=400, focal_length_mm=85)
+        db.session.commit()
+
+
+def test_range_filters_are_inclusive(app, client):
+    add_exposures(app)
+    assert titles(client.get('/api/portfolio/search?iso_min=400&fields=title')) == ['Night street', 'Portrait']
+    assert titles(client.get('/api/portfolio/search?aperture_min=1.4&aperture_max=2.8&fields=title')) == \
+        ['Night street', 'Portrait']
+    assert titles(client.get('/api/portfolio/search?exposure_max=0.004&focal_length_max=50&fields=title')) == \
+        ['Noon dunes']
+
+
+def test_range_bounds_must_be_finite_numbers(app, client):
+    add_exposures(app)
+    for query in ('iso_min=fast', 'iso_min=nan', 'aperture_max=inf', 'exposure_min=-Infinity'):
+        response = client.get(f'/api/portfolio/search?{query}')
+        assert response.status_code == 400, query
+        assert 'bounds must be' in response.get_json()['error']
@@ -0,0 +1,35 @@
+from conftest import make_jpeg, photo
+
+
+def upload_frames(client):
+    """Two shots with a re-encoded copy of each; returns {name: image id}"""
+    files = [(make_jpeg(image=photo(seed), quality=quality), f'{seed}-{quality}.jpg')
+             for seed in (1, 2) for quality in (95, 60)]
+    response = client.post('/api/admin/upload/batch', data={'images': files}, content_type='multipart/form-data')
+    return {item['file']: item['image']['id'] for item in response.get_json()['results']}
+
+
+def similar_ids(response):
+    return [image['id'] for image in response.get_json()['similar']]
+
+
+def test_similar_images_of_different_ids(app, client):
+    ids = upload_frames(client)
+    first = client.get(f"/api/portfolio/{ids['1-95.jpg']}/similar?fields=id")
+    second = client.get(f"/api/portfolio/{ids['2-95.jpg']}/similar?fields=id")
+    assert similar_ids(first) == [ids['1-60.jpg']]
+    assert similar_ids(second) == [ids['2-60.jpg']]
+    assert first.headers['ETag'] != second.headers['ETag']
+
+    # Served from the response cache, still per image
+    again = client.get(f"/api/portfolio/{ids['2-95.jpg']}/similar?fields=id")
+    assert again.get_json() == second.get_json()
+    # One image's ETag does not revalidate another's
+    other = client.get(f"/api/portfolio/{ids['1-60.jpg']}/similar?fields=id",
+                       headers={'If-None-Match': first.headers['ETag']})
+    assert other.status_code == 200
+    assert similar_ids(other) == [ids['1-95.jpg']]
+
+
+def test_similar_images_of_a_missing_image(client):
+    assert client.get('/api/portfolio/999/similar').status_code == 404
@@ -0,0 +1,46 @@
+import gzip
+import os
+from src.services import static_assets as static_assets_module
+
+SCRIPT = b'console.log("gallery");\n' * 100
+
+
+def static_app(app, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    os.makedirs(app.static_folder)
+    with open(os.path.join(app.static_folder, 'app.js'), 'wb') as script:
+        script.write(SCRIPT)
+    return app.static_folder
+
+
+def test_serves_a_compressed_sibling(app, client, tmp_path):
+    static_folder = static_app(app, tmp_path)
+    response = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == SCRIPT
+    assert os.path.exists(os.path.join(static_folder, 'app.js.gz'))
+
+
+def test_rebuilds_a_stale_sibling(app, client, tmp_path):
+    static_folder = static_app(app, tmp_path)
+    client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    source = os.path.join(static_folder, 'app.js')
+    with open(source, 'ab') as script:
+        script.write(b'// edited\n')
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    response = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(response.data) == SCRIPT + b'// edited\n'
+
+
+def test_unwritable_static_folder_serves_uncompressed(app, client, tmp_path, monkeypatch):
+    static_folder = static_app(app, tmp_path)
+
+    def read_only(*args, **kwargs):
+        raise PermissionError(30, 'Read-only file system')
+    monkeypatch.setattr(static_assets_module.tempfile, 'mkstemp', read_only)
+    response = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == SCRIPT
+    assert os.listdir(static_folder) == ['app.js']
@@ -0,0 +1,80 @@
+import io
+import os
+import boto3
+import pytest
+from moto import mock_aws
+from src.services.storage import S3Storage, copy_storage_command, storage
+
+BUCKET = 'portfolio'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket=BUCKET)
+        yield S3Storage(BUCKET, '/images/')
+
+
+def object_keys():
+    return sorted(obj['Key'] for obj in boto3.client('s3').list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def test_save_open_exists(s3):
+    assert not s3.exists('ab/cd/photo.jpg')
+    s3.save('ab/cd/photo.jpg', io.BytesIO(b'original'))
+    assert s3.exists('ab/cd/photo.jpg')
+    assert object_keys() == ['images/ab/cd/photo.jpg']
+    with s3.open('ab/cd/photo.jpg') as fileobj:
+        assert fileobj.read() == b'original'
+    assert list(s3.list())[0][:2] == ('ab/cd/photo.jpg', 8)
+
+
+def test_localize_and_publish(s3):
+    s3.save('ab/cd/photo.jpg', io.BytesIO(b'original'))
+    with s3.workspace() as folder:
+        path = s3.localize('ab/cd/photo.jpg', folder)
+        assert path.startswith(folder)
+        with open(path, 'rb') as original:
+            assert original.read() == b'original'
+        os.makedirs(os.path.join(folder, 'renditions'))
+        with open(os.path.join(folder, 'renditions', 'photo_480.webp'), 'wb') as rendition:
+            rendition.write(b'rendition')
+        s3.publish(folder, ['renditions/photo_480.webp'])
+    assert not os.path.exists(folder)
+    assert object_keys() == ['images/ab/cd/photo.jpg', 'images/renditions/photo_480.webp']
+
+
+def test_legacy_static_urls_read_from_storage(app, client, s3, monkeypatch):
+    monkeypatch.setattr(storage, 'backend', s3)
+    s3.save('ab/cd/photo.jpg', io.BytesIO(b'original'))
+    response = client.get('/static/assets/ab/cd/photo.jpg')
+    assert response.status_code == 302
+    assert '/images/ab/cd/photo.jpg' in response.location
+
+
+def test_legacy_static_urls_with_local_storage(app, client):
+    # The test upload folder is outside the static folder
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'photo.jpg'), 'wb') as original:
+        original.write(b'original')
+    assert client.get('/static/assets/photo.jpg').data == b'original'
+    assert client.get('/static/assets/missing.jpg').status_code == 404
+
+
+def test_copy_storage(app, s3, monkeypatch):
+    for key in ('ab/cd/photo.jpg', 'renditions/photo_480.webp'):
+        path = os.path.join(app.config['UPLOAD_FOLDER'], key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            output.write(key.encode())
+    monkeypatch.setattr(storage, 'backend', s3)
+    runner = app.test_cli_runner()
+    with app.app_context():
+        assert 'Copied 2 files' in runner.invoke(copy_storage_command).output
+        assert 'Copied 0 files, 2 already stored' in runner.invoke(copy_storage_command).output
+    assert object_keys() == ['images/ab/cd/photo.jpg', 'images/renditions/photo_480.webp']
+    with s3.open('renditions/photo_480.webp') as fileobj:
+        assert fileobj.read() == b'renditions/photo_480.webp'